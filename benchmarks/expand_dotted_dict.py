@@ -0,0 +1,95 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+"""Micro-benchmark of the expansion of dotted dicts.
+
+Compare _expand_dotted_dict with the previous, recursive, implementation on a
+patch similar to a full funckey layout on many lines:
+
+    python benchmarks/expand_dotted_dict.py [nb_lines] [nb_funckeys]
+
+"""
+
+import sys
+import timeit
+
+from wazo_provd_cli.client import _expand_dotted_dict
+
+
+def _recursive_do_expand_dotted_dict(dotted_dict, result_dict):
+    for k, v in dotted_dict.items():
+        k_head, sep, k_tail = k.partition('.')
+        if sep:
+            if k_head in result_dict:
+                cur_result_dict = result_dict[k_head]
+                if not isinstance(cur_result_dict, dict):
+                    cur_result_dict = {}
+                    result_dict[k_head] = cur_result_dict
+            else:
+                cur_result_dict = {}
+                result_dict[k_head] = cur_result_dict
+            _recursive_do_expand_dotted_dict({k_tail: v}, cur_result_dict)
+        else:
+            if isinstance(v, dict):
+                if k in result_dict:
+                    cur_result_dict = result_dict[k]
+                    if isinstance(cur_result_dict, dict):
+                        _recursive_do_expand_dotted_dict(v, cur_result_dict)
+                    else:
+                        cur_result_dict = {}
+                        _recursive_do_expand_dotted_dict(v, cur_result_dict)
+                        result_dict[k] = cur_result_dict
+                else:
+                    cur_result_dict = {}
+                    _recursive_do_expand_dotted_dict(v, cur_result_dict)
+                    result_dict[k] = cur_result_dict
+            else:
+                if k in result_dict:
+                    if not isinstance(result_dict[k], dict):
+                        result_dict[k] = v
+                else:
+                    result_dict[k] = v
+
+
+def _recursive_expand_dotted_dict(dotted_dict):
+    result = {}
+    _recursive_do_expand_dotted_dict(dotted_dict, result)
+    return result
+
+
+def _funckeys_patch(nb_lines, nb_funckeys):
+    patch = {}
+    for line in range(1, nb_lines + 1):
+        patch[f'sip_lines.{line}.username'] = f'user{line}'
+        patch[f'sip_lines.{line}.password'] = f'secret{line}'
+        for funckey in range(1, nb_funckeys + 1):
+            prefix = f'sip_lines.{line}.funckeys.{funckey}'
+            patch[f'{prefix}.type'] = 'speeddial'
+            patch[f'{prefix}.value'] = f'{1000 + funckey}'
+            patch[f'{prefix}.label'] = f'Key {funckey}'
+            patch[f'{prefix}.line'] = line
+    return {'raw_config': patch}
+
+
+def main():
+    nb_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    nb_funckeys = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    patch = _funckeys_patch(nb_lines, nb_funckeys)
+    nb_keys = len(patch['raw_config'])
+    assert _expand_dotted_dict(patch) == _recursive_expand_dotted_dict(patch)
+
+    print(f'Expanding a patch of {nb_keys} dotted keys')
+    results = {}
+    for name, fun in [
+        ('recursive', _recursive_expand_dotted_dict),
+        ('iterative', _expand_dotted_dict),
+    ]:
+        timer = timeit.Timer(lambda: fun(patch))
+        number, _ = timer.autorange()
+        results[name] = min(timer.repeat(5, number)) / number
+        print(f'    {name}: {results[name] * 1000:.2f} ms')
+    print(f'Speedup: {results["recursive"] / results["iterative"]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
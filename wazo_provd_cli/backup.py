@@ -0,0 +1,366 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+"""Export of the provd objects to a compressed JSONL snapshot, and restore.
+
+A snapshot is made of two compressed members. The first one contains a
+single header line, with the number of records of each type and the
+SHA-256 of the (uncompressed) body. The second one contains the body, one
+JSON record per line, in this order: parameters, plugins, configs and
+devices. For example:
+
+    {"type": "header", "version": 1, "counts": {...}, "sha256": "..."}
+    {"type": "parameter", "data": {"id": "locale", "value": null, ...}}
+    {"type": "plugin", "id": "xivo-aastra-3.3.1-SP4", "data": {...}}
+    {"type": "config", "data": {"id": "base", ...}, "raw": {...}}
+    {"type": "device", "data": {"id": "...", "mac": "...", ...}}
+
+Snapshots are compressed with zstd if the path ends with '.zst', which
+needs the zstandard package, and with gzip otherwise.
+
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from wazo_provd_cli.client import OPTIONS, BulkResult, _map_concurrently
+from wazo_provd_cli.graph import config_levels
+
+VERSION = 1
+
+_RECORD_TYPES = ('parameter', 'plugin', 'config', 'device')
+
+
+def _guess_compression(path):
+    if path.endswith('.zst'):
+        return 'zstd'
+    return 'gzip'
+
+
+def _check_compression(compression):
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('zstd compression needs the zstandard package')
+    elif compression != 'gzip':
+        raise ValueError(compression)
+
+
+def _compress(data, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def _compressed_writer(fobj, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().stream_writer(fobj, closefd=False)
+    return gzip.GzipFile(fileobj=fobj, mode='wb')
+
+
+def _compressed_reader(fobj, compression):
+    # read all the members, i.e. the header and the body
+    if compression == 'zstd':
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            fobj, read_across_frames=True
+        )
+        return io.BufferedReader(reader)
+    return gzip.GzipFile(fileobj=fobj, mode='rb')
+
+
+def _encode_record(record):
+    return json.dumps(record, sort_keys=True, separators=(',', ':')).encode() + b'\n'
+
+
+class _BodyWriter:
+    # write the records of the body, counting them and hashing them
+
+    def __init__(self, fobj):
+        self._fobj = fobj
+        self.sha256 = hashlib.sha256()
+        self.counts = dict.fromkeys(_RECORD_TYPES, 0)
+
+    def write(self, record):
+        line = _encode_record(record)
+        self.sha256.update(line)
+        self._fobj.write(line)
+        self.counts[record['type']] += 1
+
+
+def _iter_lines(path):
+    compression = _guess_compression(path)
+    _check_compression(compression)
+    with open(path, 'rb') as fobj:
+        with _compressed_reader(fobj, compression) as reader:
+            yield from reader
+
+
+def read_header(path):
+    """Return the header of a snapshot."""
+    for line in _iter_lines(path):
+        header = json.loads(line)
+        break
+    else:
+        header = None
+    if header is None or header.get('type') != 'header':
+        raise ValueError(f'{path} is not a snapshot')
+    if header['version'] != VERSION:
+        raise ValueError(f'unsupported snapshot version {header["version"]}')
+    return header
+
+
+def _iter_body_lines(path):
+    lines = _iter_lines(path)
+    next(lines, None)
+    return lines
+
+
+def iter_records(path):
+    """Yield the records of a snapshot, starting with its header.
+
+    The records are read one at a time. The checksum is not verified.
+
+    """
+    for line in _iter_lines(path):
+        yield json.loads(line)
+
+
+class Exporter:
+    """Export the provd objects to a snapshot."""
+
+    def __init__(self, configs, devices, plugins, parameters):
+        self._configs = configs
+        self._devices = devices
+        self._plugins = plugins
+        self._parameters = parameters
+
+    def _write_configs(self, body_writer, concurrency):
+        # the raw configs are fetched concurrently, while the listing is
+        # being paged through
+        for config, raw_config, exception in _map_concurrently(
+            lambda config: self._configs.get_raw(config['id']),
+            self._configs.iter_find(),
+            concurrency,
+        ):
+            if exception is not None:
+                print(
+                    f'Error while getting the raw config {config["id"]}: {exception}',
+                    file=sys.stderr,
+                )
+            body_writer.write({'type': 'config', 'data': config, 'raw': raw_config})
+
+    def _write_body(self, body_writer, concurrency):
+        for parameter in self._parameters.infos():
+            body_writer.write({'type': 'parameter', 'data': parameter})
+        for plugin_id, plugin_info in sorted(self._plugins.installed().items()):
+            body_writer.write({'type': 'plugin', 'id': plugin_id, 'data': plugin_info})
+        self._write_configs(body_writer, concurrency)
+        for device in self._devices.iter_find():
+            body_writer.write({'type': 'device', 'data': device})
+
+    def export(self, path, concurrency=None):
+        """Export the parameters, the installed plugins, the configs, with
+        their raw config, and the devices to a snapshot file.
+
+        Return the header of the snapshot.
+
+        """
+        compression = _guess_compression(path)
+        _check_compression(compression)
+        directory = os.path.dirname(os.path.abspath(path))
+        # The body is written to a temporary file first, since the header
+        # that comes before it depends on its content. The snapshot is then
+        # moved in place, so that an interrupted export doesn't leave a
+        # truncated snapshot behind.
+        with tempfile.TemporaryFile(dir=directory) as body_fobj:
+            with _compressed_writer(body_fobj, compression) as writer:
+                body_writer = _BodyWriter(writer)
+                self._write_body(body_writer, concurrency or OPTIONS.concurrency)
+            header = {
+                'type': 'header',
+                'version': VERSION,
+                'counts': body_writer.counts,
+                'sha256': body_writer.sha256.hexdigest(),
+            }
+            part_path = f'{path}.part'
+            try:
+                with open(part_path, 'wb') as fobj:
+                    fobj.write(_compress(_encode_record(header), compression))
+                    body_fobj.seek(0)
+                    shutil.copyfileobj(body_fobj, fobj)
+                os.replace(part_path, path)
+            except BaseException:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                raise
+        counts = ', '.join(f'{n} {type_}s' for type_, n in header['counts'].items())
+        print(f'Exported {counts} to {path}')
+        return header
+
+
+class Restorer:
+    """Restore the configs and devices of a snapshot."""
+
+    def __init__(self, configs, devices, plugins):
+        self._configs = configs
+        self._devices = devices
+        self._plugins = plugins
+
+    def _scan(self, path):
+        # Return a tuple (config parent IDs, plugins used by devices) after
+        # having verified the checksum of the snapshot. Only the IDs are
+        # kept, the records are read again when restoring them.
+        header = read_header(path)
+        sha256 = hashlib.sha256()
+        parent_ids = {}
+        device_plugins = set()
+        for line in _iter_body_lines(path):
+            sha256.update(line)
+            record = json.loads(line)
+            if record['type'] == 'config':
+                config = record['data']
+                parent_ids[config['id']] = config.get('parent_ids', [])
+            elif record['type'] == 'device':
+                plugin_id = record['data'].get('plugin')
+                if plugin_id:
+                    device_plugins.add(plugin_id)
+        if sha256.hexdigest() != header['sha256']:
+            raise ValueError(f'{path} is corrupted: checksum mismatch')
+        return parent_ids, device_plugins
+
+    def _install_plugins(self, plugin_ids):
+        missing_plugin_ids = sorted(set(plugin_ids) - set(self._plugins.installed()))
+        for plugin_id in missing_plugin_ids:
+            print(f'Installing plugin {plugin_id}')
+            try:
+                self._plugins.install(plugin_id)
+            except Exception as e:
+                print(
+                    f'Error while installing plugin {plugin_id}: {e}', file=sys.stderr
+                )
+
+    def _iter_data(self, path, record_type):
+        for line in _iter_body_lines(path):
+            record = json.loads(line)
+            if record['type'] == record_type:
+                yield record['data']
+
+    def _add_concurrently(self, add, documents, concurrency, kind, result):
+        for document, _, exception in _map_concurrently(add, documents, concurrency):
+            item_id = document.get('id')
+            if exception is None:
+                result.add_success(item_id)
+            else:
+                print(
+                    f'Error while restoring {kind} {item_id}: {exception}',
+                    file=sys.stderr,
+                )
+                result.add_failure(item_id, exception)
+
+    def _add_or_update(self, collection, existing_ids):
+        def add_or_update(document):
+            if document['id'] in existing_ids:
+                return collection.update(document)
+            return collection.add(document)
+
+        return add_or_update
+
+    def _iter_restorable(self, documents, dependency_ids, failed_ids, result):
+        # skip the documents that depend on a config that could not be restored
+        for document in documents:
+            failed_dependency_ids = failed_ids.intersection(dependency_ids(document))
+            if failed_dependency_ids:
+                failed_dependencies = ', '.join(sorted(failed_dependency_ids))
+                result.add_failure(
+                    document.get('id'), f'config {failed_dependencies} not restored'
+                )
+            else:
+                yield document
+
+    def restore(self, path, concurrency=None):
+        """Restore the configs and devices of a snapshot.
+
+        The plugins used by the devices are installed first if missing. The
+        configs are then created level by level, parents first, each level
+        concurrently, and finally the devices, concurrently. The configs and
+        devices that already exist, e.g. the system configs of a rebuilt
+        provd, are updated instead. Return a tuple (config BulkResult, device
+        BulkResult).
+
+        """
+        concurrency = concurrency or OPTIONS.concurrency
+        parent_ids, device_plugins = self._scan(path)
+        self._install_plugins(device_plugins)
+
+        levels, cyclic_ids = config_levels(
+            [
+                {'id': config_id, 'parent_ids': config_parent_ids}
+                for config_id, config_parent_ids in parent_ids.items()
+            ]
+        )
+        if cyclic_ids:
+            print(
+                f'Configs inheriting from a cycle, restored last: '
+                f'{", ".join(sorted(cyclic_ids))}',
+                file=sys.stderr,
+            )
+            levels.append(sorted(cyclic_ids))
+        existing_config_ids = {
+            config['id'] for config in self._configs.iter_find(fields=['id'])
+        }
+        existing_device_ids = {
+            device['id'] for device in self._devices.iter_find(fields=['id'])
+        }
+        config_result = BulkResult()
+        for level in levels:
+            level_ids = set(level)
+            configs = (
+                config
+                for config in self._iter_data(path, 'config')
+                if config['id'] in level_ids
+            )
+            configs = self._iter_restorable(
+                configs,
+                lambda config: config.get('parent_ids', ()),
+                set(config_result.failed),
+                config_result,
+            )
+            self._add_concurrently(
+                self._add_or_update(self._configs, existing_config_ids),
+                configs,
+                concurrency,
+                'config',
+                config_result,
+            )
+
+        device_result = BulkResult()
+        devices = self._iter_restorable(
+            self._iter_data(path, 'device'),
+            lambda device: [device['config']] if device.get('config') else [],
+            set(config_result.failed),
+            device_result,
+        )
+        self._add_concurrently(
+            self._add_or_update(self._devices, existing_device_ids),
+            devices,
+            concurrency,
+            'device',
+            device_result,
+        )
+        print(
+            f'Restored {len(config_result.succeeded):d} configs '
+            f'({len(config_result.failed):d} failed) and '
+            f'{len(device_result.succeeded):d} devices '
+            f'({len(device_result.failed):d} failed)'
+        )
+        return config_result, device_result
@@ -0,0 +1,48 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+"""Execution of scripts in batch mode, i.e. without the interactive console."""
+
+import ast
+import json
+from contextlib import nullcontext, redirect_stdout
+
+
+def execute(source, filename, namespace, stdout=None):
+    """Execute the statements of source one at a time in namespace, and
+    return the value of the last statement if it's an expression, else None.
+
+    Exceptions raised by the statements are not caught, so that the first
+    failing statement stops the execution. If stdout is given, what the
+    statements print on sys.stdout is written to it instead.
+
+    """
+    with redirect_stdout(stdout) if stdout is not None else nullcontext():
+        return _execute(source, filename, namespace)
+
+
+def _execute(source, filename, namespace):
+    value = None
+    for stmt in ast.parse(source, filename).body:
+        if isinstance(stmt, ast.Expr):
+            expression = ast.Expression(stmt.value)
+            value = eval(compile(expression, filename, 'eval'), namespace)
+        else:
+            module = ast.Module([stmt], type_ignores=[])
+            exec(compile(module, filename, 'exec'), namespace)
+            value = None
+    return value
+
+
+def _json_default(obj):
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
+    if hasattr(obj, '__dict__'):
+        # e.g. a BulkResult
+        return {k: v for k, v in vars(obj).items() if not k.startswith('_')}
+    return str(obj)
+
+
+def to_json(value):
+    """Return the JSON representation of value, for the --json option."""
+    return json.dumps(value, indent=2, sort_keys=True, default=_json_default)
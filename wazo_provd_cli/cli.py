@@ -1,4 +1,4 @@
-# Copyright 2011-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0+
 
 """A command-line interpreter that interact with provd servers."""
@@ -10,6 +10,7 @@ import os
 import re
 import readline
 import sys
+import traceback
 import types
 from argparse import ArgumentParser
 from pprint import pprint
@@ -19,6 +20,7 @@ from xivo.config_helper import parse_config_file
 from xivo.token_renewer import TokenRenewer
 
 import wazo_provd_cli.helpers as helpers
+from wazo_provd_cli import batch
 from wazo_provd_cli import client as cli_client
 
 DEFAULT_HISTFILE = os.path.expanduser('~/.wazo_provd_cli')
@@ -50,12 +52,33 @@ parser.add_argument(
     help='enable or disable verification of the certificate used by provd,'
     ' or path of the certificate to use for validation',
 )
-parser.add_argument('-c', '--command', help='specify the command to execute')
+batch_group = parser.add_mutually_exclusive_group()
+batch_group.add_argument('-c', '--command', help='specify the command to execute')
+batch_group.add_argument(
+    '--file',
+    help='execute the statements of a script, or of the standard input if "-", '
+    'and exit with a non-zero status on the first failure',
+)
+parser.add_argument(
+    '--json',
+    action='store_true',
+    default=False,
+    help='with -c or --file, print the value of the last expression as JSON',
+)
+parser.add_argument(
+    '--cache-ttl',
+    type=float,
+    default=0,
+    help='cache the devices and configs fetched for that number of seconds',
+)
 parser.add_argument(
     '--tests', action='store_true', default=False, help='import the tests module'
 )
 
 opts, args = parser.parse_known_args()
+batch_mode = opts.command is not None or opts.file is not None
+if opts.json and not batch_mode:
+    parser.error('--json requires -c or --file')
 
 
 if sys.argv[0].endswith('xivo-provd-cli'):
@@ -85,7 +108,9 @@ if opts.verify is not None:
     _CONFIG['provd']['verify_certificate'] = _bool(opts.verify)
 
 # # create client object
-client = cli_client.new_cli_provisioning_client(_CONFIG['provd'])
+client = cli_client.new_cli_provisioning_client(
+    _CONFIG['provd'], cache_ttl=opts.cache_ttl
+)
 
 # read key from key file and setup token renewer
 key_file = parse_config_file(_CONFIG['auth'].pop('key_file'))
@@ -100,6 +125,7 @@ configs = client.configs()
 devices = client.devices()
 plugins = client.plugins()
 parameters = client.parameters()
+cache = client.cache
 
 
 # create help
@@ -168,6 +194,10 @@ RAW_HELP_MAP = {
     Remove config 'foo'
 
         configs.remove('foo')
+
+    Set the NTP server of every config that inherits from 'base'
+
+        configs.select({'parent_ids': 'base'}).set_config({'ntp.ip': '10.0.0.1'})
 """,
     cli_client.Config: """\
 \x1b[1mDescription\x1b[0m
@@ -196,6 +226,12 @@ RAW_HELP_MAP = {
     Get the config 'foo' in raw form
 
         configs['foo'].get_raw()
+
+    Set the NTP server and unset the vlan ID of config 'foo' in a single update
+
+        with configs['foo'].edit() as config:
+            config.set_config({'ntp.ip': '10.0.0.1'})
+            config.unset_config('vlan.id')
 """,
     cli_client.Devices: """\
 \x1b[1mDescription\x1b[0m
@@ -234,6 +270,12 @@ RAW_HELP_MAP = {
     equivalent to a remove than an add)
 
         devices.update({'id': 'foo', 'mac': '00:11:22:33:44:55'})
+
+    Download all the devices once, then look them up locally
+
+        snapshot = devices.snapshot()
+        snapshot.using_mac('00:11:22:33:44:55').synchronize()
+        snapshot.find(model='6731i')
 """,
     cli_client.Device: """\
 \x1b[1mDescription\x1b[0m
@@ -263,6 +305,13 @@ RAW_HELP_MAP = {
     Get device 'foo'
 
         devices['foo'].get()
+
+    Set the 'config' and unset the 'plugin' parameter of device 'foo' in a
+    single update
+
+        with devices['foo'].edit() as device:
+            device.set({'config': 'guest'})
+            device.unset('plugin')
 """,
     cli_client.Plugins: """\
 \x1b[1mDescription\x1b[0m
@@ -309,6 +358,27 @@ RAW_HELP_MAP = {
     Install all available plugin-packages
 
         plugins['xivo-aastra-2.6.0.2010'].install_all()
+""",
+    cli_client.SessionCache: """\
+\x1b[1mDescription\x1b[0m
+    Cache of the devices and configs fetched from the provisioning server.
+
+    The cache is disabled unless the CLI is started with --cache-ttl or the
+    ttl attribute is set. It is invalidated by the modifications made
+    through this CLI.
+
+\x1b[1mExamples\x1b[0m
+    Cache the fetched devices and configs for 30 seconds
+
+        cache.ttl = 30
+
+    Get the number of hits and misses
+
+        cache.stats()
+
+    Empty the cache
+
+        cache.clear()
 """,
     cli_client.Parameters: """\
 \x1b[1mDescription\x1b[0m
@@ -373,7 +443,7 @@ def dirr(obj):
 
 
 # initialize the helpers module
-helpers._init_module(configs, devices, plugins)
+helpers._init_module(configs, devices, plugins, parameters)
 
 
 # import and initialize the tests module
@@ -404,6 +474,7 @@ cli_globals = {
     'devices': devices,
     'plugins': plugins,
     'parameters': parameters,
+    'cache': cache,
     'help': cli_help,
     'python_help': builtins.help,
     '__builtins__': builtins,
@@ -483,23 +554,54 @@ def get_class_members(klass):
     return ret
 
 
-completer = Completer(cli_globals)
-readline.set_completer(completer.complete)
-readline.parse_and_bind('tab: complete')
+def setup_readline():
+    completer = Completer(cli_globals)
+    readline.set_completer(completer.complete)
+    readline.parse_and_bind('tab: complete')
+
+    # read history file
+    # purge history from previous raw_input calls, etc
+    readline.clear_history()
+    try:
+        readline.read_history_file(DEFAULT_HISTFILE)
+    except OSError:
+        # can't read or no such file
+        try:
+            # create new file rw only by user
+            os.close(os.open(DEFAULT_HISTFILE, os.O_WRONLY, 0o600))
+        except OSError:
+            pass
 
 
-# read history file
-# purge history from previous raw_input calls, etc
-readline.clear_history()
-try:
-    readline.read_history_file(DEFAULT_HISTFILE)
-except OSError:
-    # can't read or no such file
+def save_readline_history():
+    readline.set_history_length(DEFAULT_HISTFILESIZE)
     try:
-        # create new file rw only by user
-        os.close(os.open(DEFAULT_HISTFILE, os.O_WRONLY, 0o600))
+        readline.write_history_file(DEFAULT_HISTFILE)
     except OSError:
-        pass
+        print('warning: could not save history')
+
+
+def run_batch():
+    # run all the statements in this session, stopping at the first failure
+    if opts.command is not None:
+        source, filename = opts.command, '<command>'
+    elif opts.file == '-':
+        source, filename = sys.stdin.read(), '<stdin>'
+    else:
+        with open(opts.file) as fobj:
+            source, filename = fobj.read(), opts.file
+    # with --json, stdout is only for the JSON of the value, so that it can be
+    # parsed by scripts
+    stdout = sys.stderr if opts.json else None
+    try:
+        value = batch.execute(source, filename, cli_globals, stdout)
+    except SystemExit:
+        raise
+    except BaseException:
+        traceback.print_exc()
+        sys.exit(1)
+    if opts.json:
+        print(batch.to_json(value))
 
 
 # create interpreter and interact with user
@@ -515,16 +617,13 @@ with token_renewer:
     except Exception as e:
         print('Error while connecting to wazo-provd:', e, file=sys.stderr)
         sys.exit(1)
-    if opts.command:
-        exec(opts.command, cli_globals)
+    if batch_mode:
+        run_batch()
     else:
+        setup_readline()
         cli = CustomInteractiveConsole(cli_globals)
         cli.interact('')
 
 
-# save history file
-readline.set_history_length(DEFAULT_HISTFILESIZE)
-try:
-    readline.write_history_file(DEFAULT_HISTFILE)
-except OSError:
-    print('warning: could not save history')
+if not batch_mode:
+    save_readline_history()
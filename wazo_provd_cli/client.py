@@ -1,11 +1,15 @@
-# Copyright 2011-2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0+
 
+import heapq
 import sys
-from copy import deepcopy
-from itertools import chain
-from sys import stdout
-from time import sleep
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from copy import copy, deepcopy
+from itertools import count
+from queue import Queue
+from threading import Condition, Event, Lock, Thread
+from time import monotonic, sleep
 
 from wazo_provd_client import Client as ProvdClient
 from wazo_provd_client.operation import (
@@ -16,6 +20,8 @@ from wazo_provd_client.operation import (
     BaseOperation,
 )
 
+from wazo_provd_cli.graph import config_levels
+from wazo_provd_cli.journal import Journal
 from wazo_provd_cli.mac import norm_mac
 
 
@@ -26,6 +32,13 @@ class _Options:
         self.op_progress = True
         self.op_async = False
         self.oip_update_interval = 1.0
+        self.oip_poll_min_interval = 0.1
+        self.oip_poll_max_interval = 2.0
+        self.oip_render_stats = False
+        self.board_refresh_interval = 0.5
+        self.board_max_rows = 20
+        self.concurrency = 16
+        self.find_page_size = 500
 
 
 OPTIONS = _Options()
@@ -71,50 +84,88 @@ def _build_write_table(oip):
     #   - a tree position is a tuple that is used to reach the oip in an oip tree
     #   - completed is true when the item represent an completed operation (i.e.
     #     an operation in state fail or success), else false
+    # Return a tuple (write table, oips), where oips[i] is the oip of the
+    # position specification write_table[i].
+    write_table = []
+    oips = []
+
     def aux(cur_oip, cur_pos):
-        sub_table = []
+        write_table.append((cur_pos, False))
+        oips.append(cur_oip)
         for pos_suffix, oip in enumerate(cur_oip.sub_oips):
-            pos = cur_pos + (pos_suffix,)
-            sub_table.extend(aux(oip, pos))
-        return list(chain([(cur_pos, False)], sub_table, [(cur_pos, True)]))
-
-    return aux(oip, ())
-
-
-def _retrieve_oip(top_oip, tree_pos):
-    # return the oip at tree position tree_pos
-    oip = top_oip
-    for pos in tree_pos:
-        oip = oip.sub_oips[pos]
-    return oip
-
-
-def _write_oip_info(top_oip, init_pos_spec, cur_pos_spec, fobj):
-    # This function write the the line between init_pos_spec and cur_pos_spec.
-    # If they are the same, rewrite the line at init_pos_spec
-    # 1. create a flat list of operation to visit
-    write_table = _build_write_table(top_oip)
-    # 2. find the one will visit in this call
-    init_idx = write_table.index(init_pos_spec)
-    cur_idx = write_table.index(cur_pos_spec)
-    # 3. write the lines...
-    pos_specs = set(write_table[init_idx : cur_idx + 1])
-    for idx in range(init_idx, cur_idx + 1):
-        tree_pos, completed = write_table[idx]
-        oip = _retrieve_oip(top_oip, tree_pos)
-        if not completed and (tree_pos, True) in pos_specs:
-            if idx == init_idx and idx != 0:
-                # just skip it
-                fobj.write('\n')
-                continue
+            aux(oip, cur_pos + (pos_suffix,))
+        write_table.append((cur_pos, True))
+        oips.append(cur_oip)
+
+    aux(oip, ())
+    return write_table, oips
+
+
+class _OperationTreeWriter:
+    # Write the lines of an oip tree as the operation progresses.
+    #
+    # The write table, its position index and the oip at each position are
+    # kept from one frame to the next. They are only rebuilt when the sub
+    # oips of the top oip are replaced, i.e. after the operation has been
+    # updated, or when a position isn't known yet, i.e. when sub oips have
+    # been appended, so that a frame costs O(written lines), not O(tree). The
+    # line under the cursor is only rewritten when its content has changed.
+
+    def __init__(self, fobj):
+        self._fobj = fobj
+        self._sub_oips = None
+        self._write_table = []
+        self._index = {}
+        self._oips = []
+        self._last_line = None
+        self.nb_frames = 0
+        self.nb_bytes = 0
+
+    def _update_write_table(self, top_oip, init_pos_spec, cur_pos_spec):
+        if (
+            top_oip.sub_oips is self._sub_oips
+            and init_pos_spec in self._index
+            and cur_pos_spec in self._index
+        ):
+            return
+        self._sub_oips = top_oip.sub_oips
+        self._write_table, self._oips = _build_write_table(top_oip)
+        self._index = {pos_spec: idx for idx, pos_spec in enumerate(self._write_table)}
+
+    def write(self, top_oip, init_pos_spec, cur_pos_spec):
+        # Write the the line between init_pos_spec and cur_pos_spec.
+        # If they are the same, rewrite the line at init_pos_spec
+        self._update_write_table(top_oip, init_pos_spec, cur_pos_spec)
+        init_idx = self._index[init_pos_spec]
+        cur_idx = self._index[cur_pos_spec]
+        chunks = []
+        for idx in range(init_idx, cur_idx + 1):
+            tree_pos, completed = self._write_table[idx]
+            # top_oip is a new copy at each frame, the other oips are shared
+            oip = self._oips[idx] if tree_pos else top_oip
+            if not completed and init_idx < self._index[(tree_pos, True)] <= cur_idx:
+                if idx == init_idx and idx != 0:
+                    # just skip it
+                    chunks.append('\n')
+                    continue
+                else:
+                    # we need to rewrite the oip
+                    oip = BaseOperation(oip.label, OIP_PROGRESS)
+            line = _format_oip_line(oip, tree_pos)
+            if init_idx == cur_idx and self._last_line == (cur_pos_spec, line):
+                # nothing has changed since the last frame
+                break
+            chunks.append('\r' + line)
+            if idx != cur_idx:
+                chunks.append('\n')
             else:
-                # we need to rewrite the oip
-                oip = BaseOperation(oip.label, OIP_PROGRESS)
-        line = _format_oip_line(oip, tree_pos)
-        fobj.write('\r' + line)
-        if idx != cur_idx:
-            fobj.write('\n')
-        fobj.flush()
+                self._last_line = (cur_pos_spec, line)
+        data = ''.join(chunks)
+        self.nb_frames += 1
+        self.nb_bytes += len(data.encode())
+        if data:
+            self._fobj.write(data)
+            self._fobj.flush()
 
 
 def _find_active_oip(top_oip):
@@ -132,31 +183,243 @@ def _find_active_oip(top_oip):
     return aux(top_oip, ())
 
 
+class _OperationPoller:
+    # Poll every pending operation from a single shared thread.
+    #
+    # Operations are kept in a priority queue ordered by their next poll time.
+    # A new operation is polled right away, then the delay between two polls
+    # doubles up to OPTIONS.oip_poll_max_interval, so that short operations
+    # complete with little latency while long ones (i.e. downloads) don't
+    # flood provd with requests. Waiters are woken up through futures.
+
+    def __init__(self):
+        self._condition = Condition()
+        self._queue = []
+        self._counter = count()
+        self._thread = None
+
+    def submit(self, client_oip):
+        """Return a future whose result is the final state of the operation."""
+        future = Future()
+        with self._condition:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._push(monotonic(), client_oip, future, OPTIONS.oip_poll_min_interval)
+        return future
+
+    def _push(self, poll_time, client_oip, future, interval):
+        entry = (poll_time, next(self._counter), client_oip, future, interval)
+        heapq.heappush(self._queue, entry)
+        self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue or self._queue[0][0] > monotonic():
+                    if self._queue:
+                        self._condition.wait(self._queue[0][0] - monotonic())
+                    else:
+                        self._condition.wait()
+                _, _, client_oip, future, interval = heapq.heappop(self._queue)
+            self._poll(client_oip, future, interval)
+
+    def _poll(self, client_oip, future, interval):
+        if future.cancelled():
+            return
+        try:
+            client_oip.update()
+        except Exception as e:
+            future.set_exception(e)
+            return
+        if client_oip.state in [OIP_SUCCESS, OIP_FAIL]:
+            future.set_result(client_oip.state)
+        else:
+            with self._condition:
+                self._push(
+                    monotonic() + interval,
+                    client_oip,
+                    future,
+                    min(2 * interval, OPTIONS.oip_poll_max_interval),
+                )
+
+
+_POLLER = _OperationPoller()
+
+
 def _display_operation_in_progress(client_oip):
+    future = _POLLER.submit(client_oip)
+    writer = _OperationTreeWriter(sys.stdout)
     init_pos_spec = ((), False)
+    timeout = OPTIONS.oip_poll_min_interval
     while True:
-        client_oip.update()
-        cur_pos_spec = _find_active_oip(client_oip)
-        _write_oip_info(client_oip, init_pos_spec, cur_pos_spec, stdout)
-        if client_oip.state in [OIP_SUCCESS, OIP_FAIL]:
+        wait([future], timeout)
+        timeout = OPTIONS.oip_update_interval
+        if future.done():
+            # raise the polling error, if any
+            future.result()
+        # work on a copy since the operation is updated from the poller thread
+        oip = copy(client_oip)
+        if oip.state is None:
+            # not polled yet
+            continue
+        cur_pos_spec = _find_active_oip(oip)
+        writer.write(oip, init_pos_spec, cur_pos_spec)
+        if oip.state in [OIP_SUCCESS, OIP_FAIL]:
             # operation completed
             assert cur_pos_spec == ((), True)
             break
         else:
             init_pos_spec = cur_pos_spec
-            sleep(OPTIONS.oip_update_interval)
     print()
+    if OPTIONS.oip_render_stats:
+        print(
+            f'{writer.nb_frames} frames, {writer.nb_bytes} bytes written',
+            file=sys.stderr,
+        )
+    return oip.state
+
+
+def _wait_operation_in_progress(client_oip):
+    # wait for the operation to complete and return its final state
+    return _POLLER.submit(client_oip).result()
 
 
 def _nodisplay_operation_in_progress(client_oip):
-    while True:
-        if client_oip.state in [OIP_SUCCESS, OIP_FAIL]:
-            break
-        else:
-            sleep(OPTIONS.oip_update_interval)
+    _wait_operation_in_progress(client_oip)
     print(_format_oip_line(client_oip, ()))
 
 
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f'{hours:d}:{minutes:02d}:{seconds:02d}'
+    return f'{minutes:02d}:{seconds:02d}'
+
+
+def _format_board_item(name, oip):
+    if oip.state is None:
+        # not polled yet
+        return f'{name} waiting...'
+    line = f'{name} {_FMT_STATE_MAP[oip.state]}'
+    if oip.current is not None:
+        if oip.end:
+            percent = 100 * oip.current // oip.end
+            line += f' {oip.current}/{oip.end} ({percent}%)'
+        else:
+            line += f' {oip.current}'
+    return line
+
+
+class _OperationBoard:
+    # Display the progress of many operations in progress at the same time.
+    #
+    # Operations are registered with track() by the threads waiting on them
+    # and unregistered with finish() once completed. A background thread
+    # refreshes a compact status board at a fixed rate when the output is a
+    # terminal, else it writes one line each time an operation changes state.
+
+    def __init__(self, total=None, fobj=None):
+        if fobj is None:
+            # looked up at each call, since sys.stdout may be redirected
+            fobj = sys.stdout
+        self._total = total
+        self._fobj = fobj
+        self._is_tty = fobj.isatty()
+        self._lock = Lock()
+        self._running = {}
+        self._last_states = {}
+        self._failed = {}
+        self._nb_done = 0
+        self._nb_lines = 0
+        self._start_time = None
+        self._stop_event = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._start_time = monotonic()
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop_event.set()
+        self._thread.join()
+        self._refresh()
+        if not self._is_tty:
+            self._fobj.write(self._format_header() + '\n')
+        for name, error in self._failed.items():
+            print(f'{name}: {error}', file=sys.stderr)
+
+    def track(self, name, client_oip):
+        with self._lock:
+            self._running[name] = client_oip
+
+    def finish(self, name, error=None):
+        with self._lock:
+            self._running.pop(name, None)
+            self._last_states.pop(name, None)
+            self._nb_done += 1
+            if error is not None:
+                self._failed[name] = error
+            if not self._is_tty:
+                state = OIP_SUCCESS if error is None else OIP_FAIL
+                self._fobj.write(f'{name} {_FMT_STATE_MAP[state]}\n')
+                self._fobj.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(OPTIONS.board_refresh_interval):
+            self._refresh()
+
+    def _refresh(self):
+        with self._lock:
+            if self._is_tty:
+                self._write_board()
+            else:
+                self._write_state_changes()
+        self._fobj.flush()
+
+    def _write_state_changes(self):
+        for name, oip in self._running.items():
+            state = oip.state
+            # state is None until the operation is polled for the first time
+            if state is not None and state != self._last_states.get(name):
+                self._last_states[name] = state
+                self._fobj.write(f'{name} {_FMT_STATE_MAP[state]}\n')
+
+    def _write_board(self):
+        lines = [self._format_header()]
+        names = sorted(self._running)
+        max_rows = OPTIONS.board_max_rows
+        for name in names[:max_rows]:
+            lines.append('    ' + _format_board_item(name, self._running[name]))
+        if len(names) > max_rows:
+            lines.append(f'    ... and {len(names) - max_rows} more')
+        # move back to the beginning of the board before redrawing it
+        if self._nb_lines:
+            self._fobj.write(f'\x1b[{self._nb_lines}A')
+        for line in lines:
+            self._fobj.write('\r\x1b[K' + line + '\n')
+        self._fobj.write('\x1b[J')
+        self._nb_lines = len(lines)
+
+    def _format_header(self):
+        nb_failed = len(self._failed)
+        elapsed = monotonic() - self._start_time
+        header = (
+            f'running: {len(self._running)}  done: {self._nb_done - nb_failed}  '
+            f'failed: {nb_failed}'
+        )
+        if self._total is not None:
+            header += f'  total: {self._total}'
+            if self._nb_done:
+                remaining = self._total - self._nb_done
+                eta = elapsed / self._nb_done * remaining
+                header += f'  eta: {_format_duration(eta)}'
+        header += f'  elapsed: {_format_duration(elapsed)}'
+        return header
+
+
 def _search_in_pkgs_gen(pkgs, search):
     # define search package predicate
     if OPTIONS.search_description:
@@ -199,25 +462,272 @@ def _search_in_pkgs(pkgs, search):
         return dict(_search_in_pkgs_gen(pkgs, search))
 
 
+def _map_concurrently(fun, items, concurrency):
+    # call fun on each item from at most concurrency threads and yield
+    # (item, result, exception) tuples in completion order. Items are consumed
+    # lazily so that only a bounded number of calls are pending at any time.
+    items = iter(items)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending = {}
+    try:
+        while True:
+            for item in items:
+                pending[executor.submit(fun, item)] = item
+                if len(pending) >= 2 * concurrency:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                exception = future.exception()
+                if exception is None:
+                    yield item, future.result(), None
+                else:
+                    yield item, None, exception
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _TokenBucket:
+    # Limit the rate of an operation to rate operations per second, with bursts
+    # of at most burst operations. acquire() can be called from many threads.
+
+    def __init__(self, rate, burst=1):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._last_time = monotonic()
+        self._lock = Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = monotonic()
+                elapsed = now - self._last_time
+                self._tokens = min(self._burst, self._tokens + elapsed * self._rate)
+                self._last_time = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self._rate
+            sleep(delay)
+
+
+class BulkResult:
+    """The outcome of an operation applied to many items.
+
+    succeeded is the list of item IDs for which the operation succeeded,
+    skipped is the list of item IDs for which there was nothing to do and
+    failed is a dictionary mapping item IDs to an error message.
+
+    """
+
+    def __init__(self):
+        self.succeeded = []
+        self.skipped = []
+        self.failed = {}
+
+    def add_success(self, item_id):
+        self.succeeded.append(item_id)
+
+    def add_skip(self, item_id):
+        self.skipped.append(item_id)
+
+    def add_failure(self, item_id, error):
+        self.failed[item_id] = str(error)
+
+    def __repr__(self):
+        skipped = f'{len(self.skipped)} skipped, ' if self.skipped else ''
+        return (
+            f'<{type(self).__name__}: {len(self.succeeded)} succeeded, '
+            f'{skipped}{len(self.failed)} failed>'
+        )
+
+
+def _run_operations_concurrently(
+    start_operation, item_ids, concurrency, rate=None, on_success=None, total=None
+):
+    # Call start_operation on each item ID from at most concurrency threads,
+    # wait for the returned operations to complete while displaying their
+    # progress on a board, and return a BulkResult. item_ids can be any
+    # iterable if total, the expected number of items, is given.
+    result = BulkResult()
+    token_bucket = _TokenBucket(rate) if rate is not None else None
+    if total is None:
+        total = len(item_ids)
+    with _OperationBoard(total=total) as board:
+
+        def run_operation(item_id):
+            if token_bucket is not None:
+                token_bucket.acquire()
+            client_oip = start_operation(item_id)
+            try:
+                board.track(item_id, client_oip)
+                return _wait_operation_in_progress(client_oip)
+            finally:
+                client_oip.delete()
+
+        for item_id, state, exception in _map_concurrently(
+            run_operation, item_ids, concurrency
+        ):
+            if exception is not None:
+                error = exception
+            elif state != OIP_SUCCESS:
+                error = 'operation failed'
+            else:
+                board.finish(item_id)
+                result.add_success(item_id)
+                if on_success is not None:
+                    on_success(item_id)
+                continue
+            board.finish(item_id, error)
+            result.add_failure(item_id, error)
+    return result
+
+
+def _iter_list_pages(mgr, result_key, args, kwargs, page_size):
+    # Yield every item of a provd listing, one page at a time, in ID order.
+    # The next page is fetched in the background while the current one is
+    # being consumed.
+    page_size = page_size or OPTIONS.find_page_size
+
+    def list_page(offset):
+        return mgr.list(
+            *args,
+            offset=offset,
+            limit=page_size,
+            order='id',
+            direction='ASC',
+            **kwargs,
+        )[result_key]
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        offset = 0
+        future = executor.submit(list_page, offset)
+        while future is not None:
+            page = future.result()
+            if len(page) < page_size:
+                future = None
+            else:
+                offset += page_size
+                future = executor.submit(list_page, offset)
+            yield from page
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _remove_concurrently(remove, item_ids, concurrency, kind, result, journal=None):
+    # remove the items with the given IDs and add the outcome to result
+    for item_id, _, exception in _map_concurrently(
+        remove, item_ids, concurrency or OPTIONS.concurrency
+    ):
+        if exception is None:
+            print(f'Removed {kind} {item_id}')
+            result.add_success(item_id)
+            if journal is not None:
+                journal.record(item_id)
+        else:
+            print(
+                f'Error while removing {kind} {item_id}: {exception}', file=sys.stderr
+            )
+            result.add_failure(item_id, exception)
+
+
 def _get_id(id_or_dict):
     if isinstance(id_or_dict, str):
         return id_or_dict
     return id_or_dict['id']
 
 
+class SessionCache:
+    """A read-through cache of the devices and configs fetched from provd.
+
+    Entries expire after ttl seconds and the least recently used entries are
+    evicted once there's more than max_size entries. The cache is disabled
+    when ttl is 0. Entries are invalidated by the modifications made through
+    this CLI, but not by the modifications made by others.
+
+    """
+
+    def __init__(self, ttl=0, max_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, fetch):
+        # key is a tuple (namespace, item ID or None, detail)
+        if not self.ttl:
+            return fetch()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return deepcopy(entry[1])
+            self.misses += 1
+        value = fetch()
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, namespace, item_id=None):
+        # invalidate the entries of item_id (or of every item if None) and
+        # the entries that are not tied to a specific item, i.e. find results
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == namespace and (
+                    item_id is None or key[1] is None or key[1] == item_id
+                ):
+                    del self._entries[key]
+
+    def clear(self):
+        """Remove all the entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the hit and miss counters and the number of entries."""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def __repr__(self):
+        return (
+            f'<{type(self).__name__}: ttl={self.ttl}s, {len(self._entries)} entries, '
+            f'{self.hits} hits, {self.misses} misses>'
+        )
+
+
+def _find_key(namespace, args, kwargs):
+    return (namespace, None, repr((args, sorted(kwargs.items()))))
+
+
 class ProvisioningClient:
-    def __init__(self, prov_client):
+    def __init__(self, prov_client, cache_ttl=0):
         self._prov_client = prov_client
+        self._cache = SessionCache(cache_ttl)
 
     @property
     def prov_client(self):
         return self._prov_client
 
+    @property
+    def cache(self):
+        return self._cache
+
     def configs(self):
-        return Configs(self._prov_client.configs)
+        return Configs(self._prov_client.configs, self._cache)
 
     def devices(self):
-        return Devices(self._prov_client.devices)
+        return Devices(self._prov_client.devices, self._cache)
 
     def plugins(self):
         return Plugins(self._prov_client.plugins)
@@ -247,45 +757,44 @@ def _rec_update_dict(base_dict, overlay_dict):
 
 
 def _do_expand_dotted_dict(dotted_dict, result_dict):
-    for k, v in dotted_dict.items():
-        k_head, sep, k_tail = k.partition('.')
-        if sep:
-            # dotted key
-            if k_head in result_dict:
-                cur_result_dict = result_dict[k_head]
-                # replace result with empty dict if not dict
-                if not isinstance(cur_result_dict, dict):
-                    cur_result_dict = {}
-                    result_dict[k_head] = cur_result_dict
+    # Iterative depth-first walk, with a stack of (items, result dict, prefix
+    # dicts) so that deep paths and deeply nested values don't hit the
+    # recursion limit. Since a dict of the result is never replaced once
+    # created, the dict of each dotted prefix is looked up only once.
+    stack = [(iter(dotted_dict.items()), result_dict, {})]
+    while stack:
+        items, cur_result_dict, prefix_dicts = stack[-1]
+        for k, v in items:
+            if '.' in k:
+                prefix, _, k = k.rpartition('.')
+                target_dict = prefix_dicts.get(prefix)
+                if target_dict is None:
+                    # walk down to the dict of the prefix, replacing any non
+                    # dict result with an empty dict
+                    target_dict = cur_result_dict
+                    for k_head in prefix.split('.'):
+                        sub_dict = target_dict.get(k_head)
+                        if not isinstance(sub_dict, dict):
+                            sub_dict = {}
+                            target_dict[k_head] = sub_dict
+                        target_dict = sub_dict
+                    prefix_dicts[prefix] = target_dict
             else:
-                cur_result_dict = {}
-                result_dict[k_head] = cur_result_dict
-            _do_expand_dotted_dict({k_tail: v}, cur_result_dict)
-        else:
-            # non dotted key
+                target_dict = cur_result_dict
             if isinstance(v, dict):
-                if k in result_dict:
-                    cur_result_dict = result_dict[k]
-                    if isinstance(cur_result_dict, dict):
-                        # merge result
-                        _do_expand_dotted_dict(v, cur_result_dict)
-                    else:
-                        # overwrite result
-                        cur_result_dict = {}
-                        _do_expand_dotted_dict(v, cur_result_dict)
-                        result_dict[k] = cur_result_dict
-                else:
-                    cur_result_dict = {}
-                    _do_expand_dotted_dict(v, cur_result_dict)
-                    result_dict[k] = cur_result_dict
-            else:
-                if k in result_dict:
-                    old_v = result_dict[k]
-                    # overwrite if not dict
-                    if not isinstance(old_v, dict):
-                        result_dict[k] = v
-                else:
-                    result_dict[k] = v
+                sub_dict = target_dict.get(k)
+                if not isinstance(sub_dict, dict):
+                    # overwrite result
+                    sub_dict = {}
+                    target_dict[k] = sub_dict
+                # merge result, then resume with the next items
+                stack.append((iter(v.items()), sub_dict, {}))
+                break
+            if not isinstance(target_dict.get(k), dict):
+                # overwrite if not dict
+                target_dict[k] = v
+        else:
+            stack.pop()
 
 
 def _expand_dotted_dict(dotted_dict):
@@ -306,37 +815,141 @@ def _expand_dotted_dict(dotted_dict):
     return result
 
 
+class ConfigResolver:
+    """Compute the raw config of configs locally, from a single listing of
+    the configs.
+
+    The raw config of a config is its own raw config merged over the raw
+    configs of its parents, the first parent having precedence over the
+    following ones. The raw config of each config is computed once, so
+    common parents are only merged once. The base raw config defined in
+    the provd configuration is not included.
+
+    """
+
+    def __init__(self, configs):
+        self._configs = {config['id']: config for config in configs}
+        self._raw_configs = {}
+        self._errors = {}
+        self.cycles = []
+
+    def __len__(self):
+        return len(self._configs)
+
+    def get_raw(self, id_or_config):
+        """Return the raw config of a config.
+
+        Raise a ValueError if the config inherits from a cycle of configs.
+
+        """
+        return deepcopy(self._resolve(_get_id(id_or_config), ()))
+
+    def iter_raw(self):
+        """Yield a tuple (config ID, raw config) for every config that doesn't
+        inherit from a cycle.
+
+        """
+        for config_id in self._configs:
+            try:
+                raw_config = self._resolve(config_id, ())
+            except ValueError:
+                continue
+            yield config_id, deepcopy(raw_config)
+
+    def _resolve(self, config_id, path):
+        # path is the tuple of the config IDs being resolved, used to detect
+        # cycles
+        if config_id in self._raw_configs:
+            return self._raw_configs[config_id]
+        if config_id in self._errors:
+            raise self._errors[config_id]
+        if config_id in path:
+            cycle = path[path.index(config_id) :] + (config_id,)
+            self.cycles.append(cycle)
+            print(f'Cycle in config parents: {" -> ".join(cycle)}', file=sys.stderr)
+            raise ValueError(f'config {config_id} is its own parent')
+        config = self._configs[config_id]
+        try:
+            raw_config = {}
+            for parent_id in reversed(config.get('parent_ids', [])):
+                if parent_id in self._configs:
+                    parent_raw_config = self._resolve(parent_id, path + (config_id,))
+                    _rec_update_dict(raw_config, parent_raw_config)
+            _rec_update_dict(raw_config, config.get('raw_config', {}))
+        except ValueError as e:
+            self._errors[config_id] = e
+            raise
+        self._raw_configs[config_id] = raw_config
+        return raw_config
+
+
 class Configs:
-    def __init__(self, cfg_mgr):
+    def __init__(self, cfg_mgr, cache=None):
         self._cfg_mgr = cfg_mgr
+        self._cache = cache if cache is not None else SessionCache()
 
     def add(self, dotted_config):
         config = _expand_dotted_dict(dotted_config)
+        self._cache.invalidate('config')
         return self._cfg_mgr.create(config)
 
     def get(self, id_or_config):
         config_id = _get_id(id_or_config)
-        return self._cfg_mgr.get(config_id)
+        return _cached_get_config(self._cfg_mgr, self._cache, config_id)
 
     def get_raw(self, id_or_config):
         config_id = _get_id(id_or_config)
-        return self._cfg_mgr.get_raw(config_id)
+        return _cached_get_raw_config(self._cfg_mgr, self._cache, config_id)
 
     def update(self, dotted_config):
         config = _expand_dotted_dict(dotted_config)
+        # the raw config of the children depends on this config
+        self._cache.invalidate('config')
         self._cfg_mgr.update(config)
 
     def remove(self, id_or_config):
         config_id = _get_id(id_or_config)
+        self._cache.invalidate('config')
         self._cfg_mgr.delete(config_id)
 
-    def remove_all(self):
-        for config in self._cfg_mgr.list({})['configs']:
-            config_id = config['id']
-            print(f'Removing config {config_id}')
-            self._cfg_mgr.delete(config_id)
+    def remove_all(self, concurrency=None):
+        """Remove all the configs, children before their parents."""
+        configs = self._cfg_mgr.list(fields=['id', 'parent_ids'])['configs']
+        return self.remove_many(configs, concurrency)
+
+    def remove_many(self, configs, concurrency=None):
+        """Remove the given configs concurrently, children before their parents.
+
+        configs is a list of config dictionaries with at least the 'id' and
+        'parent_ids' keys. A config is not removed if one of its children
+        could not be removed.
+
+        """
+        result = BulkResult()
+        self._cache.invalidate('config')
+        parent_ids = {config['id']: config.get('parent_ids', ()) for config in configs}
+        levels, cyclic_ids = config_levels(configs)
+        if cyclic_ids:
+            # there's no safe order for these, remove them first
+            levels.append(sorted(cyclic_ids))
+        blocked_ids = set()
+        for level in reversed(levels):
+            config_ids = []
+            for config_id in level:
+                if config_id in blocked_ids:
+                    result.add_failure(config_id, 'a child config was not removed')
+                else:
+                    config_ids.append(config_id)
+            _remove_concurrently(
+                self._cfg_mgr.delete, config_ids, concurrency, 'config', result
+            )
+            for config_id in level:
+                if config_id in result.failed:
+                    blocked_ids.update(parent_ids[config_id])
+        return result
 
     def autocreate(self):
+        self._cache.invalidate('config')
         return self._cfg_mgr.autocreate()['id']
 
     def clone(self, id_or_config, new_id=None):
@@ -344,110 +957,453 @@ class Configs:
         config = self._cfg_mgr.get(old_id)
         if new_id is not None:
             config['id'] = new_id
+        self._cache.invalidate('config')
         return self._cfg_mgr.create(config)
 
     def find(self, *args, **kwargs):
-        return self._cfg_mgr.list(*args, **kwargs)['configs']
+        return self._cache.get(
+            _find_key('config', args, kwargs),
+            lambda: self._cfg_mgr.list(*args, **kwargs)['configs'],
+        )
+
+    def iter_find(self, *args, page_size=None, **kwargs):
+        """Like find, but return an iterator that fetches the configs one
+        page at a time instead of all at once.
+
+        """
+        return _iter_list_pages(self._cfg_mgr, 'configs', args, kwargs, page_size)
 
     def __getitem__(self, name):
-        return Config(name, self._cfg_mgr)
+        return Config(name, self._cfg_mgr, self._cache)
+
+    def resolver(self):
+        """List all the configs once and return a ConfigResolver, to compute
+        their raw config locally.
+
+        """
+        configs = self._cfg_mgr.list(fields=['id', 'parent_ids', 'raw_config'])
+        return ConfigResolver(configs['configs'])
+
+    def select(self, selector):
+        """Return a ConfigGroup of the configs matching the selector."""
+        configs = self._cfg_mgr.list(selector, fields=['id'])['configs']
+        config_ids = [config['id'] for config in configs]
+        return ConfigGroup(self._cfg_mgr, config_ids, self._cache)
 
     def count(self):
         return len(self._cfg_mgr.list(fields=['id'])['configs'])
 
 
+def _cow_update_dict(base_dict, overlay_dict):
+    # like _rec_update_dict, but copy-on-write: return base_dict itself if
+    # the overlay changes nothing, else a shallow copy of it in which only
+    # the modified paths are copied
+    new_dict = base_dict
+    for k, v in overlay_dict.items():
+        old_v = base_dict.get(k)
+        if isinstance(v, dict):
+            if isinstance(old_v, dict):
+                new_v = _cow_update_dict(old_v, v)
+                if new_v is old_v:
+                    continue
+            else:
+                new_v = {}
+                _rec_update_dict(new_v, v)
+        elif k in base_dict and (old_v is v or old_v == v):
+            continue
+        else:
+            new_v = v
+        if new_dict is base_dict:
+            new_dict = copy(base_dict)
+        new_dict[k] = new_v
+    return new_dict
+
+
+def _set_raw_values(old_config, values):
+    # return the config with the values merged in its raw config, or None if
+    # the config already has these values
+    raw_config = _cow_update_dict(old_config['raw_config'], values)
+    if raw_config is old_config['raw_config']:
+        return None
+    new_config = copy(old_config)
+    new_config['raw_config'] = raw_config
+    return new_config
+
+
+def _unset_raw_values(old_config, raw_values):
+    # return the config without the dotted raw values, or None if the config
+    # has none of these values
+    new_config = old_config
+    # IDs of the dicts copied by this function, which can be modified in place
+    copied_ids = set()
+    for raw_value in raw_values:
+        keys = ['raw_config'] + raw_value.split('.')
+        dicts = [new_config]
+        for key in keys[:-1]:
+            cur_dict = dicts[-1].get(key)
+            if not isinstance(cur_dict, dict):
+                break
+            dicts.append(cur_dict)
+        else:
+            if keys[-1] not in dicts[-1]:
+                continue
+            # copy the dicts on the path that have not been copied yet
+            parent_dict = None
+            for key, cur_dict in zip([None] + keys, dicts):
+                if id(cur_dict) not in copied_ids:
+                    cur_dict = copy(cur_dict)
+                    copied_ids.add(id(cur_dict))
+                    if parent_dict is None:
+                        new_config = cur_dict
+                    else:
+                        parent_dict[key] = cur_dict
+                parent_dict = cur_dict
+            del parent_dict[keys[-1]]
+    if new_config is not old_config:
+        return new_config
+    return None
+
+
+class EditConflictError(Exception):
+    """Raised when a document changed on the server while it was edited."""
+
+
+class _Editor:
+    # Collect patches, i.e. functions taking a document and returning the
+    # patched document or None if unchanged, and apply them all with a single
+    # fetch and a single update when the block exits without error. The
+    # document is fetched once more only if it is read inside the block, so
+    # that concurrent modifications can be detected.
+
+    def __init__(self, fetch, update):
+        self._fetch = fetch
+        self._update = update
+        self._patches = []
+        self._snapshot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._commit()
+
+    def _add_patch(self, patch):
+        self._patches.append(patch)
+        return self
+
+    def _apply_patches(self, document):
+        for patch in self._patches:
+            new_document = patch(document)
+            if new_document is not None:
+                document = new_document
+        return document
+
+    def _commit(self):
+        if not self._patches:
+            return
+        document = self._fetch()
+        if self._snapshot is not None and document != self._snapshot:
+            raise EditConflictError(f'{document.get("id")} changed during the edit')
+        new_document = self._apply_patches(document)
+        if new_document is not document:
+            self._update(new_document)
+
+    def get(self):
+        """Return the document with the modifications made so far."""
+        if self._snapshot is None:
+            self._snapshot = self._fetch()
+        return deepcopy(self._apply_patches(self._snapshot))
+
+
+def _cached_get_config(cfg_mgr, cache, config_id):
+    return cache.get(('config', config_id, 'get'), lambda: cfg_mgr.get(config_id))
+
+
+def _cached_get_raw_config(cfg_mgr, cache, config_id):
+    return cache.get(('config', config_id, 'raw'), lambda: cfg_mgr.get_raw(config_id))
+
+
 class Config:
-    def __init__(self, config_id, cfg_mgr):
+    def __init__(self, config_id, cfg_mgr, cache=None):
         self._id = config_id
         self._cfg_mgr = cfg_mgr
+        self._cache = cache if cache is not None else SessionCache()
 
     @property
     def id(self):
         return self._id
 
     def get(self):
-        return self._cfg_mgr.get(self._id)
+        return _cached_get_config(self._cfg_mgr, self._cache, self._id)
 
     def get_raw(self):
-        return self._cfg_mgr.get_raw(self._id)
+        return _cached_get_raw_config(self._cfg_mgr, self._cache, self._id)
+
+    def _update(self, config):
+        # the raw config of the children depends on this config
+        self._cache.invalidate('config')
+        self._cfg_mgr.update(config)
 
     def set_config(self, dotted_values):
         values = _expand_dotted_dict(dotted_values)
-        old_config = self._cfg_mgr.get(self._id)
-        new_config = deepcopy(old_config)
-        _rec_update_dict(new_config['raw_config'], values)
-        if new_config != old_config:
-            self._cfg_mgr.update(new_config)
+        new_config = _set_raw_values(self._cfg_mgr.get(self._id), values)
+        if new_config is not None:
+            self._update(new_config)
         return self
 
     def unset_config(self, *raw_values):
-        old_config = self._cfg_mgr.get(self._id)
-        new_config = deepcopy(old_config)
-        for raw_value in raw_values:
-            keys = raw_value.split('.')
-            cur_dict = new_config['raw_config']
-            for key in keys[:-1]:
-                if key in cur_dict and isinstance(cur_dict[key], dict):
-                    cur_dict = cur_dict[key]
-                else:
-                    break
-            else:
-                key = keys[-1]
-                if key in cur_dict:
-                    del cur_dict[key]
-        if old_config != new_config:
-            self._cfg_mgr.update(new_config)
+        new_config = _unset_raw_values(self._cfg_mgr.get(self._id), raw_values)
+        if new_config is not None:
+            self._update(new_config)
         return self
 
     def set_parents(self, *parents):
         config = self._cfg_mgr.get(self._id)
         config['parent_ids'] = list(parents)
-        self._cfg_mgr.update(config)
+        self._update(config)
+
+    def edit(self):
+        """Return a ConfigEditor, to be used as a context manager, that sends
+        all the modifications made in the block in a single update.
+
+        """
+        return ConfigEditor(lambda: self._cfg_mgr.get(self._id), self._update)
+
+
+class ConfigEditor(_Editor):
+    """Collect modifications to a config, see Config.edit."""
+
+    def set_config(self, dotted_values):
+        values = _expand_dotted_dict(dotted_values)
+        return self._add_patch(lambda config: _set_raw_values(config, values))
+
+    def unset_config(self, *raw_values):
+        return self._add_patch(lambda config: _unset_raw_values(config, raw_values))
+
+    def set_parents(self, *parents):
+        values = {'parent_ids': list(parents)}
+        return self._add_patch(lambda config: _set_values(config, values))
+
+
+class ConfigGroup:
+    """A group of configs, to apply the same modification to all of them."""
+
+    def __init__(self, cfg_mgr, config_ids, cache=None):
+        self._cfg_mgr = cfg_mgr
+        self._config_ids = config_ids
+        self._cache = cache if cache is not None else SessionCache()
+
+    def __len__(self):
+        return len(self._config_ids)
+
+    def set_config(self, dotted_values, concurrency=None):
+        """Set the dotted values in the raw config of each config.
+
+        Configs that already have these values are left untouched. Return a
+        BulkResult.
+
+        """
+        values = _expand_dotted_dict(dotted_values)
+        return self._patch(lambda config: _set_raw_values(config, values), concurrency)
+
+    def unset_config(self, *raw_values, concurrency=None):
+        """Unset the dotted raw values of each config.
+
+        Configs that have none of these values are left untouched. Return a
+        BulkResult.
+
+        """
+        return self._patch(
+            lambda config: _unset_raw_values(config, raw_values), concurrency
+        )
+
+    def _patch(self, patch, concurrency):
+        def patch_config(config_id):
+            new_config = patch(self._cfg_mgr.get(config_id))
+            if new_config is None:
+                return False
+            self._cfg_mgr.update(new_config)
+            return True
+
+        result = BulkResult()
+        for config_id, changed, exception in _map_concurrently(
+            patch_config, self._config_ids, concurrency or OPTIONS.concurrency
+        ):
+            if exception is not None:
+                result.add_failure(config_id, exception)
+            elif changed:
+                result.add_success(config_id)
+            else:
+                result.add_skip(config_id)
+        self._cache.invalidate('config')
+        print(
+            f'{len(result.succeeded):d} configs changed, '
+            f'{len(result.skipped):d} already compliant, '
+            f'{len(result.failed):d} failed'
+        )
+        return result
 
 
 class Devices:
-    def __init__(self, dev_mgr):
+    def __init__(self, dev_mgr, cache=None):
         self._dev_mgr = dev_mgr
+        self._cache = cache if cache is not None else SessionCache()
 
     def add(self, device):
+        self._cache.invalidate('device', device.get('id'))
         return self._dev_mgr.create(device)
 
     def get(self, id_or_device):
         # return a device as a dictionary
         # see __getitem__ to retrieve it as an object
         device_id = _get_id(id_or_device)
-        return self._dev_mgr.get(device_id)
+        return _cached_get_device(self._dev_mgr, self._cache, device_id)
 
     def update(self, device):
+        self._cache.invalidate('device', device['id'])
         self._dev_mgr.update(device)
 
     def remove(self, id_or_device):
         device_id = _get_id(id_or_device)
+        self._cache.invalidate('device', device_id)
         self._dev_mgr.delete(device_id)
 
-    def remove_all(self):
-        for device in self._dev_mgr.list({})['devices']:
-            device_id = device['id']
-            print(f'Removing device {device_id}')
-            self._dev_mgr.delete(device_id)
+    def remove_all(self, resume=False, concurrency=None, journal=False):
+        """Remove all the devices.
+
+        If journal is true, the removed devices are recorded in a journal, so
+        that an interrupted call can be resumed. If resume is true, the
+        devices removed by a previous interrupted call are skipped.
+
+        """
+        devices = self._dev_mgr.list(fields=['id'])['devices']
+        with Journal(
+            'devices-remove_all', resume, enabled=journal or resume
+        ) as journal:
+            device_ids = [
+                device['id'] for device in devices if device['id'] not in journal
+            ]
+            return self._remove_many(device_ids, concurrency, journal)
+
+    def update_many(
+        self,
+        devices,
+        synchronize=False,
+        concurrency=None,
+        rate=None,
+        on_updated=None,
+        on_synchronized=None,
+    ):
+        """Update the given devices concurrently, and optionally synchronize
+        them.
+
+        Each device is synchronized as soon as it has been updated, by a
+        second pool of threads that starts at most rate synchronizations per
+        second. on_updated and on_synchronized, if given, are called with the
+        ID of each device updated and synchronized. Return a BulkResult.
+
+        """
+        concurrency = concurrency or OPTIONS.concurrency
+        self._cache.invalidate('device')
+        if not synchronize:
+            result = BulkResult()
+            self._update_many(devices, concurrency, result, on_updated)
+            return result
+
+        updated_ids = Queue()
+        update_result = BulkResult()
+        stop_event = Event()
+
+        def devices_to_update():
+            for device in devices:
+                if stop_event.is_set():
+                    return
+                yield device
+
+        def on_device_updated(device_id):
+            if on_updated is not None:
+                on_updated(device_id)
+            updated_ids.put(device_id)
+
+        def run_updates():
+            try:
+                self._update_many(
+                    devices_to_update(), concurrency, update_result, on_device_updated
+                )
+            finally:
+                updated_ids.put(None)
+
+        updater = Thread(target=run_updates)
+        updater.start()
+        try:
+            result = _run_operations_concurrently(
+                self._dev_mgr.synchronize,
+                iter(updated_ids.get, None),
+                concurrency,
+                rate=rate,
+                on_success=on_synchronized,
+                total=len(devices),
+            )
+        finally:
+            stop_event.set()
+            updater.join()
+        for device_id, error in update_result.failed.items():
+            result.add_failure(device_id, f'update failed: {error}')
+        return result
+
+    def _update_many(self, devices, concurrency, result, on_updated):
+        for device, _, exception in _map_concurrently(
+            self._dev_mgr.update, devices, concurrency
+        ):
+            if exception is None:
+                result.add_success(device['id'])
+                if on_updated is not None:
+                    on_updated(device['id'])
+            else:
+                result.add_failure(device['id'], exception)
+
+    def remove_many(self, ids_or_devices, concurrency=None):
+        """Remove the given devices concurrently."""
+        device_ids = [_get_id(device) for device in ids_or_devices]
+        return self._remove_many(device_ids, concurrency)
+
+    def _remove_many(self, device_ids, concurrency, journal=None):
+        result = BulkResult()
+        self._cache.invalidate('device')
+        _remove_concurrently(
+            self._dev_mgr.delete, device_ids, concurrency, 'device', result, journal
+        )
+        return result
 
     def reconfigure(self, id_or_device):
         device_id = _get_id(id_or_device)
         self._dev_mgr.reconfigure(device_id)
 
     def synchronize(self, id_or_device):
+        """Synchronize a device and return the final state of the operation."""
         device_id = _get_id(id_or_device)
         client_oip = self._dev_mgr.synchronize(device_id)
         try:
-            _display_operation_in_progress(client_oip)
+            return _display_operation_in_progress(client_oip)
         finally:
             client_oip.delete()
 
     def find(self, *args, **kwargs):
-        return self._dev_mgr.list(*args, **kwargs)['devices']
+        return self._cache.get(
+            _find_key('device', args, kwargs),
+            lambda: self._dev_mgr.list(*args, **kwargs)['devices'],
+        )
+
+    def iter_find(self, *args, page_size=None, **kwargs):
+        """Like find, but return an iterator that fetches the devices one
+        page at a time instead of all at once.
+
+        """
+        return _iter_list_pages(self._dev_mgr, 'devices', args, kwargs, page_size)
 
     def __getitem__(self, name):
-        return Device(name, self._dev_mgr)
+        return Device(name, self._dev_mgr, self._cache)
 
     def count(self):
         return len(self._dev_mgr.list(fields=['id'])['devices'])
@@ -460,10 +1416,91 @@ class Devices:
         device_ids = [device['id'] for device in devices]
         return DeviceGroup(self._dev_mgr, device_ids)
 
+    def group(self, ids_or_devices):
+        device_ids = [_get_id(device) for device in ids_or_devices]
+        return DeviceGroup(self._dev_mgr, device_ids)
+
     def using_mac(self, mac):
         normalized_mac = norm_mac(mac)
         return self._new_device_group_from_selector({'mac': normalized_mac})
 
+    def snapshot(self, *args, **kwargs):
+        """Download the devices once and return them as a DeviceSnapshot.
+
+        The arguments are the same as the ones of find.
+
+        """
+        devices = self._dev_mgr.list(*args, **kwargs)['devices']
+        return DeviceSnapshot(self._dev_mgr, devices)
+
+
+class DeviceSnapshot:
+    """An in-memory snapshot of the devices, indexed on their most common
+    fields, so that lookups don't need a request to provd.
+
+    The snapshot is not updated when the devices are modified.
+
+    """
+
+    INDEXED_FIELDS = ('mac', 'plugin', 'config', 'ip', 'model')
+
+    def __init__(self, dev_mgr, devices):
+        self._dev_mgr = dev_mgr
+        self._devices = {device['id']: device for device in devices}
+        self._indexes = {field: {} for field in self.INDEXED_FIELDS}
+        for device in devices:
+            for field, index in self._indexes.items():
+                value = device.get(field)
+                if value is not None:
+                    index.setdefault(value, []).append(device['id'])
+
+    def __len__(self):
+        return len(self._devices)
+
+    def get(self, device_id):
+        return self._devices[device_id]
+
+    def find(self, **criteria):
+        """Return the devices whose fields are equal to the given values.
+
+        >>> snapshot.find(plugin='xivo-aastra-3.3.1-SP4', model='6731i')
+
+        """
+        indexed = [field for field in criteria if field in self._indexes]
+        if indexed:
+            # start from the smallest candidate list
+            candidate_ids = min(
+                (self._indexes[field].get(criteria[field], []) for field in indexed),
+                key=len,
+            )
+            candidates = (self._devices[device_id] for device_id in candidate_ids)
+        else:
+            candidates = self._devices.values()
+        return [
+            device
+            for device in candidates
+            if all(device.get(field) == value for field, value in criteria.items())
+        ]
+
+    def _new_device_group(self, field, value):
+        device_ids = list(self._indexes[field].get(value, []))
+        return DeviceGroup(self._dev_mgr, device_ids)
+
+    def using_mac(self, mac):
+        return self._new_device_group('mac', norm_mac(mac))
+
+    def using_plugin(self, plugin_id):
+        return self._new_device_group('plugin', plugin_id)
+
+    def using_config(self, config_id):
+        return self._new_device_group('config', config_id)
+
+    def using_ip(self, ip):
+        return self._new_device_group('ip', ip)
+
+    def using_model(self, model):
+        return self._new_device_group('model', model)
+
 
 class DeviceGroup:
     def __init__(self, dev_mgr, device_ids):
@@ -475,56 +1512,129 @@ class DeviceGroup:
             print(f'Reconfiguring device {device_id}')
             self._dev_mgr.reconfigure(device_id)
 
-    def synchronize(self):
+    def synchronize(self, concurrency=None, rate=None, _on_success=None):
+        """Synchronize the devices of the group.
+
+        If concurrency is given, up to that number of synchronize operations
+        are run at the same time and a BulkResult is returned. If rate is
+        given, at most that number of synchronize operations are started per
+        second.
+
+        """
+        # _on_success is called with the ID of each device synchronized
+        # successfully, e.g. to record it in a journal
+        if concurrency is not None or rate is not None:
+            return self._synchronize_concurrently(concurrency, rate, _on_success)
         for device_id in self._device_ids:
             print(f'Synchronizing device {device_id}')
             client_oip = self._dev_mgr.synchronize(device_id)
             try:
-                _display_operation_in_progress(client_oip)
+                state = _display_operation_in_progress(client_oip)
             finally:
                 client_oip.delete()
+            if state == OIP_SUCCESS and _on_success is not None:
+                _on_success(device_id)
+
+    def _synchronize_concurrently(self, concurrency, rate, on_success):
+        return _run_operations_concurrently(
+            self._dev_mgr.synchronize,
+            self._device_ids,
+            concurrency or 1,
+            rate=rate,
+            on_success=on_success,
+        )
+
+
+def _set_values(old_document, values):
+    # return the document with the values set, or None if the document
+    # already has these values
+    new_document = old_document
+    for k, v in values.items():
+        old_v = old_document.get(k)
+        if k in old_document and (old_v is v or old_v == v):
+            continue
+        if new_document is old_document:
+            new_document = copy(old_document)
+        new_document[k] = v
+    if new_document is not old_document:
+        return new_document
+    return None
+
+
+def _unset_values(old_document, keys):
+    # return the document without the keys, or None if the document has none
+    # of these keys
+    if not any(k in old_document for k in keys):
+        return None
+    new_document = copy(old_document)
+    for k in keys:
+        new_document.pop(k, None)
+    return new_document
+
+
+class DeviceEditor(_Editor):
+    """Collect modifications to a device, see Device.edit."""
+
+    def set(self, values):
+        return self._add_patch(lambda device: _set_values(device, values))
+
+    def unset(self, *values):
+        return self._add_patch(lambda device: _unset_values(device, values))
+
+
+def _cached_get_device(dev_mgr, cache, device_id):
+    return cache.get(('device', device_id, 'get'), lambda: dev_mgr.get(device_id))
 
 
 class Device:
     # handy way to do simple modification to a device
-    def __init__(self, device_id, dev_mgr):
+    def __init__(self, device_id, dev_mgr, cache=None):
         self._id = device_id
         self._dev_mgr = dev_mgr
+        self._cache = cache if cache is not None else SessionCache()
 
     @property
     def id(self):
         return self._id
 
     def get(self):
-        return self._dev_mgr.get(self._id)
+        return _cached_get_device(self._dev_mgr, self._cache, self._id)
+
+    def _update(self, device):
+        self._cache.invalidate('device', self._id)
+        self._dev_mgr.update(device)
 
     def set(self, values):
-        old_device = self._dev_mgr.get(self._id)
-        new_device = deepcopy(old_device)
-        for k, v in values.items():
-            new_device[k] = v
-        if new_device != old_device:
-            self._dev_mgr.update(new_device)
+        new_device = _set_values(self._dev_mgr.get(self._id), values)
+        if new_device is not None:
+            self._update(new_device)
         return self
 
     def unset(self, *values):
-        old_device = self._dev_mgr.get(self._id)
-        new_device = deepcopy(old_device)
-        for k in values:
-            if k in old_device:
-                del new_device[k]
-        if new_device != old_device:
-            self._dev_mgr.update(new_device)
+        new_device = _unset_values(self._dev_mgr.get(self._id), values)
+        if new_device is not None:
+            self._update(new_device)
         return self
 
+    def edit(self):
+        """Return a DeviceEditor, to be used as a context manager, that sends
+        all the modifications made in the block in a single update.
+
+        """
+        return DeviceEditor(lambda: self._dev_mgr.get(self._id), self._update)
+
     def reconfigure(self):
         self._dev_mgr.reconfigure(self._id)
         return self
 
     def synchronize(self):
+        """Synchronize the device and return the final state of the
+        operation.
+
+        """
         client_oip = self._dev_mgr.synchronize(self._id)
         try:
-            _display_operation_in_progress(client_oip)
+            return _display_operation_in_progress(client_oip)
         finally:
             client_oip.delete()
 
@@ -620,19 +1730,33 @@ class Plugin:
         finally:
             client_oip.delete()
 
-    def install_all(self):
-        """Install all the packages available from this plugin."""
-        pkg_ids = sorted(
-            self._client_plugin.get_packages_installable(self._plugin_id)['pkgs']
-        )
-        for pkg_id in pkg_ids:
-            print(f'Installing package {pkg_id}')
-            client_oip = self._client_plugin.install_package(self._plugin_id, pkg_id)
-            try:
-                _display_operation_in_progress(client_oip)
-            finally:
-                client_oip.delete()
-            print()
+    def install_all(self, resume=False, concurrency=None, journal=False):
+        """Install all the packages available from this plugin that are not
+        already installed.
+
+        Up to concurrency packages (options.concurrency by default) are
+        installed at the same time. If journal is true, the installed packages
+        are recorded in a journal, so that an interrupted call can be resumed.
+        If resume is true, the packages installed by a previous interrupted
+        call are skipped.
+
+        """
+        installable = self._client_plugin.get_packages_installable(self._plugin_id)
+        installed = self._client_plugin.get_packages_installed(self._plugin_id)
+        pkg_ids = sorted(set(installable['pkgs']) - set(installed['pkgs']))
+        journal_name = f'plugin-{self._plugin_id}-install_all'
+        with Journal(journal_name, resume, enabled=journal or resume) as journal:
+            pkg_ids = [pkg_id for pkg_id in pkg_ids if pkg_id not in journal]
+            print(f'Installing {len(pkg_ids)} packages')
+            return _run_operations_concurrently(
+                self._start_install,
+                pkg_ids,
+                concurrency or OPTIONS.concurrency,
+                on_success=journal.record,
+            )
+
+    def _start_install(self, pkg_id):
+        return self._client_plugin.install_package(self._plugin_id, pkg_id)
 
     def upgrade(self, pkg_id):
         client_oip = self._client_plugin.upgrade_package(self._plugin_id, pkg_id)
@@ -661,6 +1785,6 @@ class Plugin:
         return _search_in_pkgs(pkgs, search)
 
 
-def new_cli_provisioning_client(provd_args):
+def new_cli_provisioning_client(provd_args, cache_ttl=0):
     prov_client = ProvdClient(**provd_args)
-    return ProvisioningClient(prov_client)
+    return ProvisioningClient(prov_client, cache_ttl)
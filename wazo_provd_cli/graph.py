@@ -0,0 +1,212 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+"""Analysis of the config inheritance graph, i.e. the graph defined by the
+parent_ids of the configs.
+
+"""
+
+
+def config_levels(configs):
+    """Return a tuple (levels, cyclic_ids).
+
+    levels is a list of lists of config IDs such that the parents of a config
+    are all in lower levels, and cyclic_ids is the set of config IDs that
+    are part of a cycle or that inherit from a config that is part of a
+    cycle. configs is a list of dictionaries with at least the 'id' and
+    'parent_ids' keys. Parent IDs that are not in configs are ignored.
+
+    """
+    parent_ids = {config['id']: set(config.get('parent_ids', ())) for config in configs}
+    children_ids = {config_id: [] for config_id in parent_ids}
+    nb_parents = {}
+    for config_id, cur_parent_ids in parent_ids.items():
+        cur_parent_ids.intersection_update(parent_ids)
+        nb_parents[config_id] = len(cur_parent_ids)
+        for parent_id in cur_parent_ids:
+            children_ids[parent_id].append(config_id)
+    levels = []
+    level = sorted(config_id for config_id, n in nb_parents.items() if n == 0)
+    while level:
+        levels.append(level)
+        next_level = []
+        for config_id in level:
+            for child_id in children_ids[config_id]:
+                nb_parents[child_id] -= 1
+                if not nb_parents[child_id]:
+                    next_level.append(child_id)
+        level = sorted(next_level)
+    cyclic_ids = {config_id for config_id, n in nb_parents.items() if n}
+    return levels, cyclic_ids
+
+
+class ConfigGraph:
+    """The config inheritance graph, built from a single listing of the
+    configs and of the configs used by devices.
+
+    configs is an iterable of dictionaries with at least the 'id' and
+    'parent_ids' keys, and devices an iterable of dictionaries with an
+    optional 'config' key. Parent IDs of unknown configs are ignored.
+
+    """
+
+    def __init__(self, configs, devices=()):
+        configs = list(configs)
+        self._parent_ids = {}
+        self._children_ids = {config['id']: [] for config in configs}
+        for config in configs:
+            parent_ids = [
+                parent_id
+                for parent_id in config.get('parent_ids', ())
+                if parent_id in self._children_ids
+            ]
+            self._parent_ids[config['id']] = parent_ids
+            for parent_id in parent_ids:
+                self._children_ids[parent_id].append(config['id'])
+        self._device_config_ids = {
+            device['config'] for device in devices if device.get('config')
+        }
+        self._levels, self._cyclic_ids = config_levels(configs)
+        self._depths = {
+            config_id: depth
+            for depth, level in enumerate(self._levels)
+            for config_id in level
+        }
+
+    def __len__(self):
+        return len(self._parent_ids)
+
+    def parents(self, config_id):
+        return list(self._parent_ids[config_id])
+
+    def children(self, config_id):
+        return list(self._children_ids[config_id])
+
+    def depth(self, config_id):
+        """Return the length of the longest chain of parents of the config,
+        or None if the config inherits from a cycle.
+
+        """
+        return self._depths.get(config_id)
+
+    def max_depth(self):
+        return len(self._levels) - 1 if self._levels else 0
+
+    def deepest_chain(self):
+        """Return one of the longest chains of configs, from the deepest
+        config up to a config without parents.
+
+        """
+        if not self._levels:
+            return []
+        chain = [self._levels[-1][0]]
+        for depth in range(len(self._levels) - 2, -1, -1):
+            for parent_id in self._parent_ids[chain[-1]]:
+                if self._depths.get(parent_id) == depth:
+                    chain.append(parent_id)
+                    break
+        return chain
+
+    def topological_order(self):
+        """Return the config IDs, parents before children.
+
+        The configs that inherit from a cycle are not included, since they
+        have no such order.
+
+        """
+        return [config_id for level in self._levels for config_id in level]
+
+    def cycles(self):
+        """Return the list of cycles, each one being a sorted list of the
+        config IDs that are part of it.
+
+        """
+        # Kosaraju's algorithm, restricted to the configs that inherit from a
+        # cycle since the other ones can't be part of a cycle
+        nodes = self._cyclic_ids
+        finish_order = []
+        visited = set()
+        for start_id in sorted(nodes):
+            if start_id in visited:
+                continue
+            visited.add(start_id)
+            stack = [(start_id, iter(self._parent_ids[start_id]))]
+            while stack:
+                config_id, parent_ids = stack[-1]
+                for parent_id in parent_ids:
+                    if parent_id in nodes and parent_id not in visited:
+                        visited.add(parent_id)
+                        stack.append((parent_id, iter(self._parent_ids[parent_id])))
+                        break
+                else:
+                    stack.pop()
+                    finish_order.append(config_id)
+
+        cycles = []
+        assigned = set()
+        for start_id in reversed(finish_order):
+            if start_id in assigned:
+                continue
+            assigned.add(start_id)
+            component = []
+            stack = [start_id]
+            while stack:
+                config_id = stack.pop()
+                component.append(config_id)
+                for child_id in self._children_ids[config_id]:
+                    if child_id in nodes and child_id not in assigned:
+                        assigned.add(child_id)
+                        stack.append(child_id)
+            if len(component) > 1 or start_id in self._parent_ids[start_id]:
+                cycles.append(sorted(component))
+        return sorted(cycles)
+
+    def orphans(self):
+        """Return the sorted IDs of the configs that are used by no device,
+        neither directly nor through one of their descendants.
+
+        """
+        used_ids = set()
+        stack = [
+            config_id
+            for config_id in self._device_config_ids
+            if config_id in self._parent_ids
+        ]
+        while stack:
+            config_id = stack.pop()
+            if config_id not in used_ids:
+                used_ids.add(config_id)
+                stack.extend(self._parent_ids[config_id])
+        return sorted(set(self._parent_ids) - used_ids)
+
+    def most_children(self, n=10):
+        """Return the n configs with the most children, as a list of tuples
+        (config ID, number of children).
+
+        """
+        fan_outs = [
+            (config_id, len(children_ids))
+            for config_id, children_ids in self._children_ids.items()
+            if children_ids
+        ]
+        fan_outs.sort(key=lambda fan_out: (-fan_out[1], fan_out[0]))
+        return fan_outs[:n]
+
+    def report(self, n=10):
+        """Print a summary of the graph."""
+        print(f'Nb of configs: {len(self)}')
+        print(f'Max inheritance depth: {self.max_depth()}')
+        print(f'    {" -> ".join(self.deepest_chain())}')
+        cycles = self.cycles()
+        print(f'Nb of cycles: {len(cycles)}')
+        for cycle in cycles:
+            print(f'    {", ".join(cycle)}')
+        orphans = self.orphans()
+        print(f'Nb of orphan configs: {len(orphans)}')
+        for config_id in orphans[:n]:
+            print(f'    {config_id}')
+        if len(orphans) > n:
+            print(f'    ... and {len(orphans) - n} more')
+        print('Configs with the most children:')
+        for config_id, nb_children in self.most_children(n):
+            print(f'    {config_id}: {nb_children}')
@@ -1,4 +1,4 @@
-# Copyright 2011-2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 #
 # This program is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
@@ -17,19 +17,32 @@
 
 
 # importing <module> as _<module> so that import are not autocompleted in the CLI
+import ipaddress as _ipaddress
 import operator as _operator
 import sys
+import time as _time
 
+from wazo_provd_client.operation import OIP_SUCCESS as _OIP_SUCCESS
 
-def _init_module(configs, devices, plugins):
+from wazo_provd_cli import backup as _backup
+from wazo_provd_cli import graph as _graph
+from wazo_provd_cli import importer as _importer
+from wazo_provd_cli import reconcile as _reconcile
+from wazo_provd_cli.client import _format_duration
+from wazo_provd_cli.journal import Journal as _Journal
+
+
+def _init_module(configs, devices, plugins, parameters=None):
     # MUST be called from another module before the function in this module
     # are made available in the CLI
     global _configs
     global _devices
     global _plugins
+    global _parameters
     _configs = configs
     _devices = devices
     _plugins = plugins
+    _parameters = parameters
 
 
 def _itemgetter_default(item, default):
@@ -52,51 +65,126 @@ def system_info():
 def detailed_system_info():
     """Print various system information."""
     print(f'Nb of devices: {_devices.count()}')
-    for device in _devices.find(fields=['id']):
+    for device in _devices.iter_find(fields=['id']):
         print(f'    {device["id"]}')
     print(f'Nb of configs: {_configs.count()}')
-    for config in _configs.find(fields=['id']):
+    for config in _configs.iter_find(fields=['id']):
         print(f'    {config["id"]}')
     print(f'Nb of installed plugins: {_plugins.count_installed()}')
     for plugin in _plugins.installed():
         print(f'    {plugin}')
 
 
-def used_plugins():
+# the plugin report is reused for that number of seconds when asked to
+_PLUGIN_REPORT_TTL = 60
+_plugin_report_cache = None
+
+
+def plugin_report(cached=False):
+    """Return a report on the plugins usage, computed from a single listing
+    of the devices and of the installed plugins.
+
+    The report is a dictionary with the following keys:
+        device_counts: the number of devices using each plugin
+        installed: the installed plugins
+        used: the plugins used by at least one device
+        unused: the installed plugins that no devices are using
+        missing: the non-installed plugins used by at least one device
+        devices_without_plugin: the IDs of the devices with no plugin
+
+    If cached is true, the report computed by a previous call in the last
+    minute is returned instead, e.g. to call several plugin helpers in a row.
+
+    """
+    global _plugin_report_cache
+    if cached and _plugin_report_cache is not None:
+        report_time, report = _plugin_report_cache
+        if _time.monotonic() - report_time < _PLUGIN_REPORT_TTL:
+            return report
+
+    device_counts = {}
+    devices_without_plugin = []
+    for device in _devices.iter_find(fields=['id', 'plugin']):
+        plugin = device.get('plugin')
+        if plugin is None:
+            devices_without_plugin.append(device['id'])
+        else:
+            device_counts[plugin] = device_counts.get(plugin, 0) + 1
+    used = set(device_counts)
+    installed = set(_plugins.installed())
+    report = {
+        'device_counts': device_counts,
+        'installed': sorted(installed),
+        'used': sorted(used),
+        'unused': sorted(installed - used),
+        'missing': sorted(used - installed),
+        'devices_without_plugin': sorted(devices_without_plugin),
+    }
+    _plugin_report_cache = (_time.monotonic(), report)
+    return report
+
+
+def _invalidate_plugin_report():
+    global _plugin_report_cache
+    _plugin_report_cache = None
+
+
+def used_plugins(cached=False):
     """Return the list of plugins used by devices."""
-    s = set(map(_itemgetter_default('plugin', None), _devices.find(fields=['plugin'])))
-    # None might be present if at least one device has no plugins
-    s.discard(None)
-    return sorted(s)
+    return list(plugin_report(cached)['used'])
 
 
-def installed_plugins():
+def installed_plugins(cached=False):
     """Return the list of all installed plugins."""
-    return sorted(_plugins.installed().keys())
+    if cached:
+        return list(plugin_report(cached)['installed'])
+    # the devices don't need to be listed for that
+    return sorted(_plugins.installed())
 
 
-def unused_plugins():
+def unused_plugins(cached=False):
     """Return the list of unused plugins, i.e. installed plugins that no
     devices are using.
 
     """
-    return sorted(set(installed_plugins()) - set(used_plugins()))
+    return list(plugin_report(cached)['unused'])
 
 
-def missing_plugins():
+def missing_plugins(cached=False):
     """Return the list of missing plugins, i.e. non-installed plugins that
     are used by at least one device.
 
     """
-    return sorted(set(used_plugins()) - set(installed_plugins()))
+    return list(plugin_report(cached)['missing'])
 
 
 def mass_update_devices_plugin(
-    old_plugin, new_plugin, synchronize=False, recurse=False
+    old_plugin,
+    new_plugin,
+    synchronize=False,
+    recurse=False,
+    resume=False,
+    dry_run=False,
+    concurrency=None,
+    rate=None,
+    journal=False,
 ):
     """Update all devices using plugin old_plugin to plugin new_plugin, and
     optionally synchronize the affected devices.
 
+    If journal is true, the updated and synchronized devices are recorded in a
+    journal, so that an interrupted call can be resumed. If resume is true,
+    the devices updated by a previous interrupted call are skipped, and those
+    that were updated but not synchronized yet are synchronized.
+
+    If dry_run is true, only print the number of affected devices per model.
+
+    If concurrency is given, up to that number of devices are updated at the
+    same time, and each device is synchronized as soon as it is updated. If
+    rate is given, at most that number of synchronizations are started per
+    second. The devices that could not be updated or synchronized are listed
+    at the end.
+
     """
     if not isinstance(old_plugin, str):
         raise ValueError(old_plugin)
@@ -104,19 +192,85 @@ def mass_update_devices_plugin(
         raise ValueError(new_plugin)
 
     installed_plugins = set(_plugins.installed())
-    if not _are_plugins_installed([old_plugin, new_plugin], installed_plugins):
+    plugins_installed = _are_plugins_installed(
+        [old_plugin, new_plugin], installed_plugins
+    )
+    if dry_run:
+        devices = _devices.find(
+            {'plugin': old_plugin}, fields=['id', 'model'], recurse=recurse
+        )
+        _print_devices_per_model(devices)
+        return
+    if not plugins_installed:
         answer = input('Do you want to proceed anyway? [Y/n] ')
         if answer and answer not in ('Y', 'y'):
             return
 
-    for device in _devices.find({'plugin': old_plugin}, recurse=recurse):
-        device['plugin'] = new_plugin
-        print(f'Updating device {device["id"]}')
-        _devices.update(device)
+    _invalidate_plugin_report()
+    journal_name = f'mass_update_devices_plugin-{old_plugin}-{new_plugin}'
+    with _Journal(journal_name, resume, enabled=journal or resume) as journal:
+        # a device updated by a previous call doesn't use old_plugin anymore,
+        # so the ones that still need to be synchronized come from the journal
         if synchronize:
-            print(f'Synchronizing device {device["id"]}')
-            _devices.synchronize(device)
-        print()
+            for device_id in sorted(_journal_pending_synchronize(journal)):
+                print(f'Synchronizing device {device_id}')
+                if _devices.synchronize(device_id) == _OIP_SUCCESS:
+                    journal.record(f'synchronized {device_id}')
+                print()
+
+        devices = _devices.find({'plugin': old_plugin}, recurse=recurse)
+        if concurrency is None and rate is None:
+            for device in devices:
+                device['plugin'] = new_plugin
+                print(f'Updating device {device["id"]}')
+                _devices.update(device)
+                journal.record(f'updated {device["id"]}')
+                if synchronize:
+                    print(f'Synchronizing device {device["id"]}')
+                    if _devices.synchronize(device) == _OIP_SUCCESS:
+                        journal.record(f'synchronized {device["id"]}')
+                print()
+            return
+
+        for device in devices:
+            device['plugin'] = new_plugin
+        print(f'Updating {len(devices)} devices')
+        result = _devices.update_many(
+            devices,
+            synchronize=synchronize,
+            concurrency=concurrency,
+            rate=rate,
+            on_updated=lambda device_id: journal.record(f'updated {device_id}'),
+            on_synchronized=lambda device_id: journal.record(
+                f'synchronized {device_id}'
+            ),
+        )
+        done = 'updated and synchronized' if synchronize else 'updated'
+        print(f'{len(result.succeeded):d} devices have been {done}')
+        if result.failed:
+            print(f'{len(result.failed):d} devices have failed:')
+            _print_table(['device', 'error'], sorted(result.failed.items()))
+
+
+def _print_devices_per_model(devices):
+    nb_devices_per_model = {}
+    for device in devices:
+        model = device.get('model', 'unknown')
+        nb_devices_per_model[model] = nb_devices_per_model.get(model, 0) + 1
+    _print_table(['model', 'devices'], sorted(nb_devices_per_model.items()))
+    print(f'{len(devices):d} devices would be updated')
+
+
+def _journal_pending_synchronize(journal):
+    updated = set()
+    synchronized = set()
+    for entry in journal.completed:
+        action, _, device_id = entry.partition(' ')
+        if action == 'updated':
+            updated.add(device_id)
+        elif action == 'synchronized':
+            synchronized.add(device_id)
+    return updated - synchronized
 
 
 def _are_plugins_installed(plugins, installed_plugins):
@@ -135,22 +289,195 @@ def _is_plugin_installed(plugin, installed_plugins):
     return False
 
 
-def mass_synchronize(recurse=False):
-    """Synchronize all devices."""
-    for device in _devices.find(fields=['id'], recurse=recurse):
-        print(f'Synchronizing device {device["id"]}')
-        _devices.synchronize(device)
-        print()
-
-
-def remove_transient_configs():
-    """Remove any unused transient config. Mostly useful for debugging purpose."""
-    n = 0
-    for config in map(
-        _operator.itemgetter('id'), _configs.find({'transient': True}, fields=['id'])
-    ):
-        if not _devices.find({'config': config}, fields=['id']):
-            print(f'Removing config {config}')
-            _configs.remove(config)
-            n += 1
-    print(f'{n:d} unused transient configs have been removed')
+def _print_table(headers, rows):
+    widths = [len(header) for header in headers]
+    for row in rows:
+        widths = [max(width, len(str(value))) for width, value in zip(widths, row)]
+    for row in [headers] + rows:
+        line = '  '.join(str(value).ljust(width) for width, value in zip(widths, row))
+        print(line.rstrip())
+
+
+def _subnet_wave_key(prefix_len):
+    def aux(device):
+        ip = device.get('ip')
+        if not ip:
+            return 'no IP'
+        return str(_ipaddress.ip_network(f'{ip}/{prefix_len}', strict=False))
+
+    return aux
+
+
+def _group_devices_in_waves(devices, waves, subnet_prefix_len):
+    if waves is None:
+        return [('all', devices)]
+    if waves == 'plugin':
+        wave_key = _itemgetter_default('plugin', 'no plugin')
+    elif waves == 'subnet':
+        wave_key = _subnet_wave_key(subnet_prefix_len)
+    else:
+        raise ValueError(waves)
+    groups = {}
+    for device in devices:
+        groups.setdefault(wave_key(device), []).append(device)
+    return sorted(groups.items())
+
+
+def mass_synchronize(
+    recurse=False,
+    concurrency=None,
+    rate=None,
+    waves=None,
+    subnet_prefix_len=24,
+    resume=False,
+    journal=False,
+):
+    """Synchronize all devices.
+
+    If concurrency is given, up to that number of devices are synchronized at
+    the same time. If rate is given, at most that number of synchronizations
+    are started per second.
+
+    If waves is 'plugin' or 'subnet', the devices are grouped by plugin or by
+    IP subnet (of length subnet_prefix_len) and each group is synchronized
+    only once the previous one is done. A summary of each wave is printed at
+    the end.
+
+    If journal is true, the synchronized devices are recorded in a journal,
+    so that an interrupted call can be resumed. If resume is true, the devices
+    synchronized by a previous interrupted call are skipped.
+
+    """
+    with _Journal('mass_synchronize', resume, enabled=journal or resume) as journal:
+        if concurrency is None and rate is None and waves is None:
+            for device in _devices.iter_find(fields=['id'], recurse=recurse):
+                if device['id'] in journal:
+                    continue
+                print(f'Synchronizing device {device["id"]}')
+                if _devices.synchronize(device) == _OIP_SUCCESS:
+                    journal.record(device['id'])
+                print()
+            return
+
+        devices = [
+            device
+            for device in _devices.iter_find(
+                fields=['id', 'plugin', 'ip'], recurse=recurse
+            )
+            if device['id'] not in journal
+        ]
+        summary = []
+        for wave, wave_devices in _group_devices_in_waves(
+            devices, waves, subnet_prefix_len
+        ):
+            print(f'Synchronizing {len(wave_devices)} devices ({wave})')
+            start_time = _time.monotonic()
+            result = _devices.group(wave_devices).synchronize(
+                concurrency=concurrency or 1, rate=rate, _on_success=journal.record
+            )
+            duration = _time.monotonic() - start_time
+            summary.append(
+                [
+                    wave,
+                    len(wave_devices),
+                    len(result.succeeded),
+                    len(result.failed),
+                    _format_duration(duration),
+                ]
+            )
+            print()
+        _print_table(['wave', 'devices', 'succeeded', 'failed', 'duration'], summary)
+
+
+def remove_transient_configs(dry_run=False, concurrency=None):
+    """Remove any unused transient config. Mostly useful for debugging purpose.
+
+    If dry_run is true, only print the configs that would be removed.
+
+    """
+    transient_configs = _configs.find({'transient': True}, fields=['id', 'parent_ids'])
+    used_config_ids = set(
+        map(
+            _itemgetter_default('config', None),
+            _devices.iter_find(fields=['id', 'config']),
+        )
+    )
+    unused_configs = [
+        config for config in transient_configs if config['id'] not in used_config_ids
+    ]
+    if dry_run:
+        for config_id in sorted(map(_operator.itemgetter('id'), unused_configs)):
+            print(f'Would remove config {config_id}')
+        print(f'{len(unused_configs):d} unused transient configs would be removed')
+        return
+    result = _configs.remove_many(unused_configs, concurrency)
+    print(f'{len(result.succeeded):d} unused transient configs have been removed')
+
+
+def config_graph(n=10):
+    """Print a report of the config inheritance graph (depth, cycles, orphan
+    configs and configs with the most children) and return the graph.
+
+    """
+    graph = _graph.ConfigGraph(
+        _configs.iter_find(fields=['id', 'parent_ids']),
+        _devices.iter_find(fields=['id', 'config']),
+    )
+    graph.report(n)
+    return graph
+
+
+def import_file(path, result_path=None, file_format=None, concurrency=None):
+    """Import the configs and devices of a CSV or JSONL file, streaming it.
+
+    Each row has a 'type' column, either 'config' or 'device', and the other
+    columns are the dotted keys of the document. In CSV files, the values are
+    strings, except true and false which are booleans; other typed values
+    need a JSONL file. Configs are created before the rows that depend on
+    them. The result of each row is written to result_path, by default the
+    path of the file suffixed with '.result.jsonl'.
+
+    """
+    importer = _importer.Importer(_configs, _devices)
+    return importer.import_file(path, result_path, file_format, concurrency)
+
+
+def export(path, concurrency=None):
+    """Export the parameters, the installed plugins, the configs and the
+    devices to a compressed JSONL snapshot, one page of objects at a time.
+
+    The snapshot is compressed with zstd if path ends with '.zst', and with
+    gzip otherwise. Return the header of the snapshot, with the number of
+    objects of each type and the checksum of the snapshot.
+
+    """
+    exporter = _backup.Exporter(_configs, _devices, _plugins, _parameters)
+    return exporter.export(path, concurrency)
+
+
+def restore(path, concurrency=None):
+    """Restore the configs and devices of a snapshot made with export().
+
+    The checksum of the snapshot is verified first, and the plugins used by
+    the devices are installed if missing. Configs are then created parents
+    first, concurrently within each level of inheritance, and finally the
+    devices, concurrently.
+
+    """
+    restorer = _backup.Restorer(_configs, _devices, _plugins)
+    return restorer.restore(path, concurrency)
+
+
+def reconcile(desired_state_file, plan_only=False, prune=True, concurrency=None):
+    """Make the configs and devices match a desired state file, a JSON or
+    YAML file with optional 'configs' and 'devices' lists, and return the
+    plan of the changes.
+
+    The current configs and devices are listed once, and only the documents
+    that differ from the desired ones are written. If prune is true, the
+    configs and devices missing from a section of the file are deleted. If
+    plan_only is true, only print the plan.
+
+    """
+    reconciler = _reconcile.Reconciler(_configs, _devices)
+    return reconciler.reconcile(desired_state_file, plan_only, prune, concurrency)
@@ -0,0 +1,212 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+"""Streaming bulk import of configs and devices from CSV or JSONL files.
+
+Each row has a 'type' column, either 'config' or 'device', and the other
+columns are the (possibly dotted) keys of the document to create, for
+example:
+
+    type,id,parent_ids,raw_config.ntp.ip,mac,config
+    config,site1,base,10.0.0.1,,
+    device,,,,00:11:22:33:44:55,site1
+
+In CSV files, empty cells are ignored, parent_ids is a comma separated
+list, the cells true and false (in any case) are booleans, e.g. for X_test,
+and the other cells are strings. Other typed values, such as numbers, need a
+JSONL file. A config must come before the rows that depend on it, i.e. the
+devices using it and the configs inheriting from it.
+
+"""
+
+import csv
+import json
+import sys
+from concurrent.futures import Future
+
+from wazo_provd_cli.client import (
+    OPTIONS,
+    BulkResult,
+    _expand_dotted_dict,
+    _map_concurrently,
+)
+from wazo_provd_cli.mac import norm_mac
+
+_TYPES = ('config', 'device')
+
+
+_CSV_BOOLEANS = {'true': True, 'false': False}
+
+
+def _decode_csv_cell(value):
+    return _CSV_BOOLEANS.get(value.lower(), value)
+
+
+def _iter_csv_rows(fobj):
+    for row in csv.DictReader(fobj):
+        dotted_document = {k: _decode_csv_cell(v) for k, v in row.items() if k and v}
+        parent_ids = dotted_document.get('parent_ids')
+        if parent_ids is not None:
+            dotted_document['parent_ids'] = [
+                parent_id.strip()
+                for parent_id in parent_ids.split(',')
+                if parent_id.strip()
+            ]
+        yield dotted_document
+
+
+def _iter_jsonl_rows(fobj):
+    # the lines are decoded by _parse_row, so that an invalid line only fails
+    # its own row
+    for line in fobj:
+        if line.strip():
+            yield line
+
+
+def _guess_format(path):
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        return 'jsonl'
+    raise ValueError(f'unknown format of file {path}, use file_format="csv" or "jsonl"')
+
+
+def _parse_row(dotted_document):
+    # return a tuple (type, document, dependency config IDs)
+    if isinstance(dotted_document, str):
+        dotted_document = json.loads(dotted_document)
+    dotted_document = dict(dotted_document)
+    row_type = dotted_document.pop('type', None)
+    if row_type not in _TYPES:
+        raise ValueError(f'invalid row type {row_type!r}')
+    document = _expand_dotted_dict(dotted_document)
+    if row_type == 'config':
+        document.setdefault('parent_ids', [])
+        document.setdefault('raw_config', {})
+        dependency_ids = document['parent_ids']
+    else:
+        if 'mac' in document:
+            document['mac'] = norm_mac(document['mac'])
+        dependency_ids = [document['config']] if 'config' in document else []
+    return row_type, document, dependency_ids
+
+
+class _Task:
+    # a row to import, with the futures of the configs it depends on, and the
+    # future of the config it creates, if any
+
+    def __init__(
+        self, row_no, row_type=None, document=None, dependencies=(), future=None
+    ):
+        self.row_no = row_no
+        self.type = row_type
+        self.document = document
+        self.dependencies = dependencies
+        self.future = future
+        self.error = None
+
+
+def _iter_tasks(rows, config_futures):
+    # Yield the tasks in the order of the rows. Since the tasks are submitted
+    # in that order to a FIFO pool, a config is always being created when a
+    # task that depends on it waits for it, so this can't deadlock.
+    for row_no, row in enumerate(rows, 1):
+        try:
+            row_type, document, dependency_ids = _parse_row(row)
+        except Exception as e:
+            task = _Task(row_no)
+            task.error = e
+            yield task
+            continue
+        dependencies = [
+            (config_id, config_futures[config_id])
+            for config_id in dependency_ids
+            if config_id in config_futures
+        ]
+        future = None
+        if row_type == 'config' and 'id' in document:
+            future = Future()
+            config_futures[document['id']] = future
+        yield _Task(row_no, row_type, document, dependencies, future)
+
+
+class Importer:
+    """Import configs and devices from a stream of rows."""
+
+    def __init__(self, configs, devices):
+        self._configs = configs
+        self._devices = devices
+
+    def _import_task(self, task):
+        try:
+            if task.error is not None:
+                raise task.error
+            for config_id, dependency in task.dependencies:
+                if dependency.exception() is not None:
+                    raise ValueError(f'config {config_id} could not be imported')
+            if task.type == 'config':
+                created = self._configs.add(task.document)
+            else:
+                created = self._devices.add(task.document)
+        except Exception as e:
+            if task.future is not None:
+                task.future.set_exception(e)
+            raise
+        if task.future is not None:
+            task.future.set_result(True)
+        return created['id'] if isinstance(created, dict) else created
+
+    def import_rows(self, rows, result_fobj, concurrency=None):
+        """Import the rows, each one being a dotted dict with a 'type' key
+        or its JSON encoding, and write the result of each row as a JSON line
+        to result_fobj.
+
+        The rows are consumed lazily. Return a BulkResult of the row
+        numbers.
+
+        """
+        result = BulkResult()
+        config_futures = {}
+        tasks = _iter_tasks(rows, config_futures)
+        for task, item_id, exception in _map_concurrently(
+            self._import_task, tasks, concurrency or OPTIONS.concurrency
+        ):
+            row_result = {'row': task.row_no, 'type': task.type}
+            if exception is None:
+                row_result.update(status='ok', id=item_id)
+                result.add_success(task.row_no)
+            else:
+                print(
+                    f'Error while importing row {task.row_no}: {exception}',
+                    file=sys.stderr,
+                )
+                row_result.update(status='failed', error=str(exception))
+                result.add_failure(task.row_no, exception)
+            result_fobj.write(json.dumps(row_result) + '\n')
+        return result
+
+    def import_file(self, path, result_path=None, file_format=None, concurrency=None):
+        """Import the configs and devices of a CSV or JSONL file.
+
+        The result of each row is written to result_path, by default the
+        path of the file suffixed with '.result.jsonl'. Return a BulkResult
+        of the row numbers.
+
+        """
+        if file_format is None:
+            file_format = _guess_format(path)
+        if file_format == 'csv':
+            iter_rows = _iter_csv_rows
+        elif file_format == 'jsonl':
+            iter_rows = _iter_jsonl_rows
+        else:
+            raise ValueError(file_format)
+        if result_path is None:
+            result_path = f'{path}.result.jsonl'
+        with open(path, newline='') as fobj, open(result_path, 'w') as result_fobj:
+            result = self.import_rows(iter_rows(fobj), result_fobj, concurrency)
+        print(
+            f'{len(result.succeeded):d} rows imported, '
+            f'{len(result.failed):d} failed, see {result_path}'
+        )
+        return result
@@ -0,0 +1,113 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+"""Journal of the items completed by long running operations."""
+
+import fcntl
+import os
+import re
+import sys
+from threading import Lock
+
+DEFAULT_JOURNAL_DIR = os.path.expanduser('~/.wazo_provd_cli_journals')
+
+_UNSAFE_CHARS = re.compile(r'[^\w.-]')
+
+
+class Journal:
+    """An on-disk, append-only journal of the IDs of the completed items of
+    an operation.
+
+    The journal is used as a context manager. Unless resume is true, any
+    journal left by a previous run of the same operation is discarded. The
+    journal is removed when the operation completes, and kept when it is
+    interrupted, so that the operation can be resumed later.
+
+    If enabled is false, or if the journal can't be written or is in use by
+    another session, the completed items are only tracked in memory.
+
+    """
+
+    def __init__(self, name, resume=False, directory=None, enabled=True):
+        if directory is None:
+            directory = DEFAULT_JOURNAL_DIR
+        self._path = os.path.join(directory, _UNSAFE_CHARS.sub('_', name))
+        self._resume = resume
+        self._enabled = enabled
+        self._lock = Lock()
+        self._fobj = None
+        self.completed = set()
+
+    @property
+    def path(self):
+        return self._path
+
+    def __enter__(self):
+        if not self._enabled:
+            return self
+        try:
+            self._open()
+        except OSError as e:
+            self._close()
+            print(
+                f'Warning: could not open journal {self._path}: {e}. '
+                'Continuing without it.',
+                file=sys.stderr,
+            )
+        return self
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self._path), mode=0o700, exist_ok=True)
+        self._fobj = open(self._path, 'a+')
+        try:
+            # another session running the same operation must not overwrite
+            # this journal
+            fcntl.flock(self._fobj, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise OSError('the journal is in use by another session')
+        if self._resume:
+            self._fobj.seek(0)
+            self.completed = {line.rstrip('\n') for line in self._fobj}
+            if self.completed:
+                print(f'Resuming: skipping {len(self.completed)} completed items')
+        else:
+            self._fobj.truncate(0)
+
+    def _close(self):
+        if self._fobj is not None:
+            self._fobj.close()
+            self._fobj = None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._fobj is None:
+            return
+        if exc_type is None:
+            os.remove(self._path)
+        else:
+            print(
+                f'Operation interrupted, progress saved in {self._path}. '
+                'Use resume=True to continue it.',
+                file=sys.stderr,
+            )
+        self._close()
+
+    def __contains__(self, item_id):
+        return item_id in self.completed
+
+    def record(self, item_id):
+        with self._lock:
+            self.completed.add(item_id)
+            if self._fobj is None:
+                return
+            try:
+                self._fobj.write(f'{item_id}\n')
+                # flush after each item so that nothing is lost if the process
+                # is killed
+                self._fobj.flush()
+            except OSError as e:
+                print(
+                    f'Warning: could not write journal {self._path}: {e}. '
+                    'Continuing without it.',
+                    file=sys.stderr,
+                )
+                self._close()
@@ -1,4 +1,4 @@
-# Copyright (C) 2011-2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright (C) 2011-2026 The Wazo Authors  (see the AUTHORS file)
 #
 # This program is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
@@ -83,10 +83,9 @@ def remove_test_configs():
     set to True.
 
     """
-    for config in _configs.find({'X_test': True}, fields=['id']):
-        config_id = config['id']
-        print(f'Removing config {config_id}')
-        _configs.remove(config_id)
+    return _configs.remove_many(
+        _configs.find({'X_test': True}, fields=['id', 'parent_ids'])
+    )
 
 
 def remove_test_devices():
@@ -94,10 +93,7 @@ def remove_test_devices():
     set to True.
 
     """
-    for device in _devices.find({'X_test': True}, fields=['id']):
-        device_id = device['id']
-        print(f'Removing device {device_id}')
-        _devices.remove(device_id)
+    return _devices.remove_many(_devices.find({'X_test': True}, fields=['id']))
 
 
 def exec_config_tests(device_id):
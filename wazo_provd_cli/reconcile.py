@@ -0,0 +1,304 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+"""Reconciliation of provd with a desired state file.
+
+The desired state file is a JSON or YAML document with an optional list of
+configs and an optional list of devices, whose keys may be dotted:
+
+    configs:
+      - id: site1
+        parent_ids: [base]
+        raw_config.ntp_ip: 10.0.0.1
+    devices:
+      - mac: 00:11:22:33:44:55
+        config: site1
+        plugin: xivo-aastra-3.3.1-SP4
+
+Configs are identified by their ID, and devices by their ID if they have
+one, else by their MAC. Only the keys present in the desired documents are
+compared with, and set on, the current documents.
+
+"""
+
+import hashlib
+import json
+import sys
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from wazo_provd_cli.client import (
+    OPTIONS,
+    BulkResult,
+    _expand_dotted_dict,
+    _map_concurrently,
+)
+from wazo_provd_cli.graph import config_levels
+from wazo_provd_cli.mac import norm_mac
+
+
+def _load_desired_state(path):
+    with open(path) as fobj:
+        if path.endswith('.yml') or path.endswith('.yaml'):
+            if yaml is None:
+                raise RuntimeError('YAML files need the PyYAML package')
+            desired_state = yaml.safe_load(fobj)
+        else:
+            desired_state = json.load(fobj)
+    if not isinstance(desired_state, dict):
+        raise ValueError(f'{path} must contain a mapping')
+    return desired_state
+
+
+def _check_config_ids(configs, section):
+    for index, config in enumerate(configs):
+        if not isinstance(config, dict) or not config.get('id'):
+            raise ValueError(f'{section} entry {index} has no id: {config!r}')
+
+
+def _digest(document, keys):
+    # return the SHA-256 of the canonical JSON of the given keys of document
+    canonical_document = {key: document.get(key) for key in keys}
+    canonical_json = json.dumps(
+        canonical_document, sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(canonical_json.encode()).hexdigest()
+
+
+def _diff(desired_documents, current_documents, current_key):
+    # return a tuple (documents to create, documents to update, unmatched
+    # current documents), where current_key returns the current document
+    # matching a desired document, if any
+    to_create = []
+    to_update = []
+    matched_ids = set()
+    for desired in desired_documents:
+        current = current_key(desired)
+        if current is None:
+            to_create.append(desired)
+            continue
+        matched_ids.add(current['id'])
+        if _digest(desired, desired) != _digest(current, desired):
+            to_update.append({**current, **desired})
+    unmatched = [
+        current for current in current_documents if current['id'] not in matched_ids
+    ]
+    return to_create, to_update, unmatched
+
+
+class ReconcilePlan:
+    """The configs and devices to create, update and delete."""
+
+    def __init__(self):
+        self.configs_to_create = []
+        self.configs_to_update = []
+        self.configs_to_delete = []
+        self.devices_to_create = []
+        self.devices_to_update = []
+        self.devices_to_delete = []
+
+    def is_empty(self):
+        return not any(vars(self).values())
+
+    def show(self):
+        for action, kind, documents in [
+            ('create', 'config', self.configs_to_create),
+            ('update', 'config', self.configs_to_update),
+            ('delete', 'config', self.configs_to_delete),
+            ('create', 'device', self.devices_to_create),
+            ('update', 'device', self.devices_to_update),
+            ('delete', 'device', self.devices_to_delete),
+        ]:
+            for document in documents:
+                device_mac = document.get('mac') if kind == 'device' else None
+                label = document.get('id') or device_mac
+                print(f'{action} {kind} {label}')
+        print(
+            f'Configs: {len(self.configs_to_create)} to create, '
+            f'{len(self.configs_to_update)} to update, '
+            f'{len(self.configs_to_delete)} to delete'
+        )
+        print(
+            f'Devices: {len(self.devices_to_create)} to create, '
+            f'{len(self.devices_to_update)} to update, '
+            f'{len(self.devices_to_delete)} to delete'
+        )
+
+    def __repr__(self):
+        nb_changes = sum(len(documents) for documents in vars(self).values())
+        return f'<{type(self).__name__}: {nb_changes} changes>'
+
+
+class Reconciler:
+    """Compute and apply the changes needed for provd to match a desired
+    state.
+
+    """
+
+    def __init__(self, configs, devices):
+        self._configs = configs
+        self._devices = devices
+
+    def plan(self, desired_state, prune=True):
+        """Return the ReconcilePlan of a desired state, a dictionary with
+        optional 'configs' and 'devices' lists.
+
+        If prune is true, the current configs and devices missing from the
+        desired state are deleted, but only for the sections present in the
+        desired state. Configs that are not deletable or that are transient
+        are never deleted.
+
+        """
+        plan = ReconcilePlan()
+        if 'configs' in desired_state:
+            _check_config_ids(desired_state['configs'], 'configs')
+            desired_configs = [
+                _expand_dotted_dict(config) for config in desired_state['configs']
+            ]
+            current_configs = self._configs.find()
+            current_configs_by_id = {config['id']: config for config in current_configs}
+            to_create, to_update, unmatched = _diff(
+                desired_configs,
+                current_configs,
+                lambda config: current_configs_by_id.get(config['id']),
+            )
+            for config in to_create:
+                config.setdefault('parent_ids', [])
+                config.setdefault('raw_config', {})
+            plan.configs_to_create = to_create
+            plan.configs_to_update = to_update
+            if prune:
+                plan.configs_to_delete = [
+                    config
+                    for config in unmatched
+                    if config.get('deletable', True) and not config.get('transient')
+                ]
+
+        if 'devices' in desired_state:
+            desired_devices = []
+            for device in desired_state['devices']:
+                device = _expand_dotted_dict(device)
+                if 'mac' in device:
+                    device['mac'] = norm_mac(device['mac'])
+                desired_devices.append(device)
+            current_devices = self._devices.find()
+            current_devices_by_id = {device['id']: device for device in current_devices}
+            current_devices_by_mac = {
+                device['mac']: device for device in current_devices if device.get('mac')
+            }
+
+            def current_device(device):
+                if 'id' in device:
+                    return current_devices_by_id.get(device['id'])
+                return current_devices_by_mac.get(device.get('mac'))
+
+            to_create, to_update, unmatched = _diff(
+                desired_devices, current_devices, current_device
+            )
+            plan.devices_to_create = to_create
+            plan.devices_to_update = to_update
+            if prune:
+                plan.devices_to_delete = unmatched
+        return plan
+
+    def _write_concurrently(self, write, documents, concurrency, kind, result):
+        for document, _, exception in _map_concurrently(write, documents, concurrency):
+            item_id = document.get('id') or document.get('mac')
+            if exception is None:
+                result.add_success(item_id)
+            else:
+                print(
+                    f'Error while writing {kind} {item_id}: {exception}',
+                    file=sys.stderr,
+                )
+                result.add_failure(item_id, exception)
+
+    def apply(self, plan, concurrency=None):
+        """Apply a plan, returning a tuple (config BulkResult, device
+        BulkResult).
+
+        Configs are created and updated parents first, devices are then
+        created and updated, and finally the devices and the configs to
+        delete are deleted, children first. Each step is concurrent.
+
+        """
+        concurrency = concurrency or OPTIONS.concurrency
+        _check_config_ids(plan.configs_to_create, 'configs_to_create')
+        _check_config_ids(plan.configs_to_update, 'configs_to_update')
+        config_result = BulkResult()
+        to_create_ids = {config['id'] for config in plan.configs_to_create}
+        configs_to_write = plan.configs_to_create + plan.configs_to_update
+        configs_by_id = {config['id']: config for config in configs_to_write}
+        levels, cyclic_ids = config_levels(configs_to_write)
+        if cyclic_ids:
+            # there's no safe order for these, write them last
+            levels.append(sorted(cyclic_ids))
+        for level in levels:
+            self._write_concurrently(
+                self._write_config(to_create_ids),
+                [configs_by_id[config_id] for config_id in level],
+                concurrency,
+                'config',
+                config_result,
+            )
+
+        device_result = BulkResult()
+        self._write_concurrently(
+            self._devices.add,
+            plan.devices_to_create,
+            concurrency,
+            'device',
+            device_result,
+        )
+        if plan.devices_to_update:
+            update_result = self._devices.update_many(
+                plan.devices_to_update, concurrency=concurrency
+            )
+            device_result.succeeded.extend(update_result.succeeded)
+            device_result.failed.update(update_result.failed)
+        if plan.devices_to_delete:
+            delete_result = self._devices.remove_many(
+                plan.devices_to_delete, concurrency
+            )
+            device_result.succeeded.extend(delete_result.succeeded)
+            device_result.failed.update(delete_result.failed)
+        if plan.configs_to_delete:
+            delete_result = self._configs.remove_many(
+                plan.configs_to_delete, concurrency
+            )
+            config_result.succeeded.extend(delete_result.succeeded)
+            config_result.failed.update(delete_result.failed)
+        return config_result, device_result
+
+    def _write_config(self, to_create_ids):
+        def write_config(config):
+            if config['id'] in to_create_ids:
+                return self._configs.add(config)
+            return self._configs.update(config)
+
+        return write_config
+
+    def reconcile(self, path, plan_only=False, prune=True, concurrency=None):
+        """Make provd match the desired state file at path, a JSON or YAML
+        file, and return the ReconcilePlan.
+
+        If plan_only is true, only print the plan, without applying it.
+
+        """
+        plan = self.plan(_load_desired_state(path), prune)
+        plan.show()
+        if plan_only or plan.is_empty():
+            return plan
+        config_result, device_result = self.apply(plan, concurrency)
+        print(
+            f'Configs: {len(config_result.succeeded):d} changed, '
+            f'{len(config_result.failed):d} failed'
+        )
+        print(
+            f'Devices: {len(device_result.succeeded):d} changed, '
+            f'{len(device_result.failed):d} failed'
+        )
+        return plan
@@ -0,0 +1,190 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+import zlib
+from unittest.mock import Mock, patch
+
+from wazo_provd_cli import backup
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.configs = Mock()
+        self.configs.iter_find.return_value = iter(
+            [
+                {'id': 'base', 'parent_ids': [], 'raw_config': {'ntp_ip': '10.0.0.1'}},
+                {'id': 'broken', 'parent_ids': ['broken'], 'raw_config': {}},
+            ]
+        )
+
+        def get_raw(config_id):
+            if config_id == 'broken':
+                raise ValueError(config_id)
+            return {'ntp_ip': '10.0.0.1'}
+
+        self.configs.get_raw.side_effect = get_raw
+        self.devices = Mock()
+        self.devices.iter_find.return_value = iter(
+            [{'id': 'd1', 'mac': '00:11:22:33:44:55', 'config': 'base'}]
+        )
+        self.plugins = Mock()
+        self.plugins.installed.return_value = {'foo': {'version': '1.0'}}
+        self.parameters = Mock()
+        self.parameters.infos.return_value = [{'id': 'locale', 'value': None}]
+        self.exporter = backup.Exporter(
+            self.configs, self.devices, self.plugins, self.parameters
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'provd.jsonl.gz')
+
+    def test_export(self):
+        header = self.exporter.export(self.path, concurrency=2)
+
+        records = list(backup.iter_records(self.path))
+        self.assertEqual(records[0], header)
+        self.assertEqual(
+            header['counts'], {'parameter': 1, 'plugin': 1, 'config': 2, 'device': 1}
+        )
+        self.assertEqual(
+            [record['type'] for record in records[1:]],
+            ['parameter', 'plugin', 'config', 'config', 'device'],
+        )
+        raw_configs = {
+            record['data']['id']: record['raw']
+            for record in records
+            if record['type'] == 'config'
+        }
+        self.assertEqual(raw_configs, {'base': {'ntp_ip': '10.0.0.1'}, 'broken': None})
+        self.assertEqual(os.listdir(self.directory.name), ['provd.jsonl.gz'])
+
+    def test_header_is_a_separate_member_with_the_body_checksum(self):
+        header = self.exporter.export(self.path)
+
+        with open(self.path, 'rb') as fobj:
+            data = fobj.read()
+        decompressor = zlib.decompressobj(wbits=31)
+        header_line = decompressor.decompress(data)
+        body = gzip.decompress(decompressor.unused_data)
+        self.assertEqual(json.loads(header_line), header)
+        self.assertEqual(header['sha256'], hashlib.sha256(body).hexdigest())
+
+
+class TestRestore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'provd.jsonl.gz')
+        self.configs = Mock()
+        self.configs.iter_find.return_value = iter([])
+        self.devices = Mock()
+        self.devices.iter_find.return_value = iter([])
+        self.plugins = Mock()
+        self.plugins.installed.return_value = {'foo': {}}
+        self.restorer = backup.Restorer(self.configs, self.devices, self.plugins)
+
+    def _export(self, configs, devices):
+        configs_mgr = Mock()
+        configs_mgr.iter_find.return_value = iter(configs)
+        configs_mgr.get_raw.return_value = {}
+        devices_mgr = Mock()
+        devices_mgr.iter_find.return_value = iter(devices)
+        plugins = Mock()
+        plugins.installed.return_value = {}
+        parameters = Mock()
+        parameters.infos.return_value = []
+        exporter = backup.Exporter(configs_mgr, devices_mgr, plugins, parameters)
+        exporter.export(self.path)
+
+    def test_configs_are_restored_parents_first(self):
+        self._export(
+            [
+                {'id': 'line', 'parent_ids': ['site', 'base']},
+                {'id': 'site', 'parent_ids': ['base']},
+                {'id': 'base', 'parent_ids': ['existing']},
+            ],
+            [
+                {'id': 'd1', 'config': 'line', 'plugin': 'foo'},
+                {'id': 'd2', 'plugin': 'bar'},
+            ],
+        )
+        calls = []
+        self.configs.add.side_effect = lambda config: calls.append(config['id'])
+        self.devices.add.side_effect = lambda device: calls.append(device['id'])
+        self.plugins.install.side_effect = lambda plugin_id: calls.append(plugin_id)
+
+        config_result, device_result = self.restorer.restore(self.path)
+
+        self.assertEqual(calls[:4], ['bar', 'base', 'site', 'line'])
+        self.assertEqual(sorted(calls[4:]), ['d1', 'd2'])
+        self.assertEqual(sorted(config_result.succeeded), ['base', 'line', 'site'])
+        self.assertEqual(sorted(device_result.succeeded), ['d1', 'd2'])
+
+    def test_children_of_failed_configs_are_not_restored(self):
+        self._export(
+            [
+                {'id': 'base', 'parent_ids': []},
+                {'id': 'site', 'parent_ids': ['base']},
+                {'id': 'other', 'parent_ids': []},
+            ],
+            [{'id': 'd1', 'config': 'site'}, {'id': 'd2', 'config': 'other'}],
+        )
+
+        def add_config(config):
+            if config['id'] == 'base':
+                raise RuntimeError()
+
+        self.configs.add.side_effect = add_config
+
+        config_result, device_result = self.restorer.restore(self.path)
+
+        self.assertEqual(config_result.succeeded, ['other'])
+        self.assertEqual(sorted(config_result.failed), ['base', 'site'])
+        self.assertEqual(device_result.succeeded, ['d2'])
+        self.assertEqual(list(device_result.failed), ['d1'])
+
+    def test_existing_configs_and_devices_are_updated(self):
+        self._export(
+            [
+                {'id': 'base', 'parent_ids': []},
+                {'id': 'site', 'parent_ids': ['base']},
+            ],
+            [{'id': 'd1', 'config': 'site'}, {'id': 'd2', 'config': 'site'}],
+        )
+        self.configs.iter_find.return_value = iter([{'id': 'base'}])
+        self.devices.iter_find.return_value = iter([{'id': 'd2'}])
+
+        config_result, device_result = self.restorer.restore(self.path)
+
+        self.assertEqual(config_result.succeeded, ['base', 'site'])
+        self.assertEqual(sorted(device_result.succeeded), ['d1', 'd2'])
+        self.configs.update.assert_called_once()
+        self.assertEqual(self.configs.update.call_args[0][0]['id'], 'base')
+        self.configs.add.assert_called_once()
+        self.assertEqual(self.configs.add.call_args[0][0]['id'], 'site')
+        self.assertEqual(self.devices.update.call_args[0][0]['id'], 'd2')
+        self.assertEqual(self.devices.add.call_args[0][0]['id'], 'd1')
+
+    def test_zstd_snapshot_without_zstandard(self):
+        path = os.path.join(self.directory.name, 'provd.jsonl.zst')
+
+        with patch('wazo_provd_cli.backup.zstandard', None):
+            self.assertRaises(RuntimeError, backup.read_header, path)
+            self.assertRaises(RuntimeError, self.restorer.restore, path)
+
+    def test_corrupted_snapshot_is_not_restored(self):
+        self._export([{'id': 'base', 'parent_ids': []}], [])
+        records = list(backup.iter_records(self.path))
+        records[1]['data']['id'] = 'changed'
+        with gzip.open(self.path, 'wb') as fobj:
+            for record in records:
+                fobj.write(backup._encode_record(record))
+
+        self.assertRaises(ValueError, self.restorer.restore, self.path)
+        self.configs.add.assert_not_called()
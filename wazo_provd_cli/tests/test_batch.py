@@ -0,0 +1,78 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+import io
+import json
+import unittest
+from contextlib import redirect_stdout
+
+from wazo_provd_cli import batch, client
+from wazo_provd_cli.client import BulkResult
+
+
+class TestExecute(unittest.TestCase):
+    def test_statements_share_the_namespace(self):
+        namespace = {'devices': ['d1', 'd2']}
+        source = 'count = len(devices)\nfor d in devices:\n    count += 1\ncount * 2\n'
+
+        value = batch.execute(source, '<test>', namespace)
+
+        self.assertEqual(value, 8)
+        self.assertEqual(namespace['count'], 4)
+
+    def test_last_statement_not_an_expression(self):
+        self.assertIsNone(batch.execute('x = 1\nx\ny = 2', '<test>', {}))
+
+    def test_execution_stops_at_first_failure(self):
+        namespace = {}
+        source = 'a = 1\nraise ValueError()\nb = 2\n'
+
+        self.assertRaises(ValueError, batch.execute, source, '<test>', namespace)
+        self.assertEqual(namespace['a'], 1)
+        self.assertNotIn('b', namespace)
+
+    def test_syntax_error_executes_nothing(self):
+        namespace = {}
+        source = 'a = 1\nb = ('
+
+        self.assertRaises(SyntaxError, batch.execute, source, '<test>', namespace)
+        self.assertNotIn('a', namespace)
+
+    def test_output_is_redirected(self):
+        namespace = {'client': client}
+        source = (
+            'print("Removed device d1")\n'
+            'board = client._OperationBoard(total=1)\n'
+            'board._fobj.write("d1 done.")\n'
+            '42\n'
+        )
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+
+        with redirect_stdout(stdout):
+            value = batch.execute(source, '<test>', namespace, stderr)
+
+        self.assertEqual(value, 42)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(stderr.getvalue(), 'Removed device d1\nd1 done.')
+
+
+class TestToJson(unittest.TestCase):
+    def test_to_json(self):
+        result = BulkResult()
+        result.add_success('d1')
+        result.add_failure('d2', ValueError('boom'))
+
+        value = json.loads(batch.to_json({'result': result, 'ids': {'b', 'a'}}))
+
+        self.assertEqual(
+            value,
+            {
+                'ids': ['a', 'b'],
+                'result': {
+                    'failed': {'d2': 'boom'},
+                    'skipped': [],
+                    'succeeded': ['d1'],
+                },
+            },
+        )
@@ -1,4 +1,4 @@
-# Copyright 2013-2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 #
 # This program is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
@@ -13,7 +13,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>
 
+import io
+import tempfile
+import time
 import unittest
+from copy import copy, deepcopy
+from unittest.mock import Mock, call, patch
+
+from wazo_provd_client.operation import (
+    OIP_FAIL,
+    OIP_PROGRESS,
+    OIP_SUCCESS,
+    BaseOperation,
+)
 
 from wazo_provd_cli import client
 
@@ -80,3 +92,604 @@ class TestExpandDottedDict(unittest.TestCase):
         dotted = {'b': 'v1', 'b.a': 'v2'}
         expanded = {'b': {'a': 'v2'}}
         self.assertEqual(expanded, client._expand_dotted_dict(dotted))
+
+    def test_dotted_key_shared_prefix_overwrite(self):
+        dotted = {'a.b.c': 'v1', 'a.b': 'v2', 'a.b.d': 'v3', 'a': {'b': {'e': 'v4'}}}
+        expanded = {'a': {'b': {'c': 'v1', 'd': 'v3', 'e': 'v4'}}}
+        self.assertEqual(expanded, client._expand_dotted_dict(dotted))
+
+    def test_deep_dotted_key(self):
+        depth = 5000
+        dotted = {'.'.join(['k'] * depth): 'v'}
+        expanded = client._expand_dotted_dict(dotted)
+        for _ in range(depth):
+            expanded = expanded['k']
+        self.assertEqual(expanded, 'v')
+
+
+class TestMapConcurrently(unittest.TestCase):
+    def test_results_and_exceptions(self):
+        def fun(item):
+            if item == 3:
+                raise ValueError(item)
+            return item * 2
+
+        results = {
+            item: (result, exception)
+            for item, result, exception in client._map_concurrently(fun, range(5), 2)
+        }
+
+        self.assertEqual(set(results), {0, 1, 2, 3, 4})
+        self.assertEqual(results[4], (8, None))
+        self.assertIsNone(results[3][0])
+        self.assertIsInstance(results[3][1], ValueError)
+
+
+class TestDeviceGroupSynchronize(unittest.TestCase):
+    def _new_oip(self, state):
+        return Mock(state=state)
+
+    def test_concurrent_synchronize(self):
+        oips = {
+            'd1': self._new_oip(OIP_SUCCESS),
+            'd2': self._new_oip(OIP_FAIL),
+        }
+        dev_mgr = Mock()
+        dev_mgr.synchronize.side_effect = oips.__getitem__
+        group = client.DeviceGroup(dev_mgr, ['d1', 'd2'])
+
+        result = group.synchronize(concurrency=2)
+
+        self.assertEqual(result.succeeded, ['d1'])
+        self.assertEqual(list(result.failed), ['d2'])
+        for oip in oips.values():
+            oip.delete.assert_called_once_with()
+
+    @patch('wazo_provd_cli.client._display_operation_in_progress')
+    def test_sequential_synchronize_only_reports_successes(self, display):
+        display.side_effect = lambda oip: oip.state
+        dev_mgr = Mock()
+        dev_mgr.synchronize.side_effect = {
+            'd1': self._new_oip(OIP_FAIL),
+            'd2': self._new_oip(OIP_SUCCESS),
+        }.__getitem__
+        on_success = Mock()
+        group = client.DeviceGroup(dev_mgr, ['d1', 'd2'])
+
+        group.synchronize(_on_success=on_success)
+
+        on_success.assert_called_once_with('d2')
+
+
+class TestOperationBoard(unittest.TestCase):
+    def test_one_line_per_state_change_when_not_a_tty(self):
+        fobj = io.StringIO()
+        oip = Mock(state=OIP_PROGRESS, current=None)
+
+        with client._OperationBoard(total=2, fobj=fobj) as board:
+            board.track('d1', oip)
+            board._refresh()
+            board._refresh()
+            board.finish('d1')
+            board.finish('d2', 'error')
+
+        lines = fobj.getvalue().splitlines()
+        self.assertEqual(lines[:3], ['d1 in progress...', 'd1 done.', 'd2 failed.'])
+        self.assertTrue(lines[3].startswith('running: 0  done: 1  failed: 1'))
+
+    def test_operations_not_polled_yet(self):
+        fobj = io.StringIO()
+        board = client._OperationBoard(total=2, fobj=fobj)
+        board._start_time = time.monotonic()
+        board.track('d1', Mock(state=None, current=None))
+        board.track('d2', Mock(state=OIP_PROGRESS, current=1, end=2))
+
+        board._write_board()
+        board._write_state_changes()
+
+        self.assertIn('    d1 waiting...\n', fobj.getvalue())
+        self.assertIn('    d2 in progress... 1/2 (50%)\n', fobj.getvalue())
+        self.assertNotIn('d1 None', fobj.getvalue())
+
+
+class TestOperationPoller(unittest.TestCase):
+    def setUp(self):
+        self.poller = client._OperationPoller()
+        patcher = patch.object(client.OPTIONS, 'oip_poll_min_interval', 0.001)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_result_is_final_state(self):
+        oip = Mock(state=OIP_PROGRESS)
+        states = iter([OIP_PROGRESS, OIP_PROGRESS, OIP_SUCCESS])
+
+        def update():
+            oip.state = next(states)
+
+        oip.update.side_effect = update
+
+        state = self.poller.submit(oip).result(timeout=5)
+
+        self.assertEqual(state, OIP_SUCCESS)
+        self.assertEqual(oip.update.call_count, 3)
+
+    def test_update_error_is_raised_to_waiter(self):
+        oip = Mock()
+        oip.update.side_effect = RuntimeError()
+
+        future = self.poller.submit(oip)
+
+        self.assertRaises(RuntimeError, future.result, 5)
+
+
+class TestOperationTreeWriter(unittest.TestCase):
+    def test_unchanged_line_is_not_rewritten(self):
+        fobj = io.StringIO()
+        writer = client._OperationTreeWriter(fobj)
+        oip = BaseOperation('op', OIP_PROGRESS, 1, 2)
+        pos_spec = ((), False)
+
+        writer.write(oip, pos_spec, pos_spec)
+        writer.write(oip, pos_spec, pos_spec)
+
+        self.assertEqual(fobj.getvalue(), "\r'op' in progress... 1/2")
+        self.assertEqual(writer.nb_frames, 2)
+        self.assertEqual(writer.nb_bytes, len(fobj.getvalue()))
+
+    def test_new_sub_oips_are_written(self):
+        fobj = io.StringIO()
+        writer = client._OperationTreeWriter(fobj)
+        oip = BaseOperation('op', OIP_PROGRESS)
+        writer.write(oip, ((), False), ((), False))
+        oip.sub_oips = [BaseOperation('sub', OIP_PROGRESS)]
+
+        writer.write(oip, ((), False), ((0,), False))
+
+        self.assertEqual(
+            fobj.getvalue(),
+            "\r'op' in progress... \r'op' in progress... \n\r    'sub' in progress... ",
+        )
+
+    def test_unchanged_tree_is_not_walked_again(self):
+        writer = client._OperationTreeWriter(io.StringIO())
+        sub_oip = BaseOperation('sub', OIP_PROGRESS, 1, 3)
+        oip = BaseOperation('op', OIP_PROGRESS, sub_oips=[sub_oip])
+        pos_spec = ((0,), False)
+
+        with patch(
+            'wazo_provd_cli.client._build_write_table',
+            wraps=client._build_write_table,
+        ) as build_write_table:
+            writer.write(oip, ((), False), pos_spec)
+            sub_oip.current = 2
+            writer.write(copy(oip), pos_spec, pos_spec)
+            oip.sub_oips = [BaseOperation('sub', OIP_PROGRESS, 3, 3)]
+            writer.write(copy(oip), pos_spec, pos_spec)
+
+        self.assertEqual(build_write_table.call_count, 2)
+        self.assertTrue(writer._fobj.getvalue().endswith("'sub' in progress... 3/3"))
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_acquire_waits_for_tokens(self):
+        token_bucket = client._TokenBucket(rate=100, burst=2)
+        start_time = time.monotonic()
+
+        for _ in range(4):
+            token_bucket.acquire()
+
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.015)
+
+
+class TestConfigsRemoveMany(unittest.TestCase):
+    def test_children_are_removed_before_parents(self):
+        cfg_mgr = Mock()
+        configs = client.Configs(cfg_mgr)
+
+        result = configs.remove_many(
+            [
+                {'id': 'base', 'parent_ids': []},
+                {'id': 'line', 'parent_ids': ['base']},
+            ]
+        )
+
+        self.assertEqual(result.succeeded, ['line', 'base'])
+        self.assertEqual(cfg_mgr.delete.call_args_list, [call('line'), call('base')])
+
+    def test_parent_is_kept_when_a_child_is_not_removed(self):
+        cfg_mgr = Mock()
+        cfg_mgr.delete.side_effect = Exception('in use')
+        configs = client.Configs(cfg_mgr)
+
+        result = configs.remove_many(
+            [
+                {'id': 'base', 'parent_ids': []},
+                {'id': 'line', 'parent_ids': ['base']},
+            ]
+        )
+
+        self.assertEqual(result.succeeded, [])
+        self.assertEqual(sorted(result.failed), ['base', 'line'])
+        cfg_mgr.delete.assert_called_once_with('line')
+
+
+class TestPluginInstallAll(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patcher = patch('wazo_provd_cli.journal.DEFAULT_JOURNAL_DIR', tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_installed_packages_are_skipped(self):
+        client_plugin = Mock()
+        client_plugin.get_packages_installable.return_value = {
+            'pkgs': {'a': {}, 'b': {}, 'c': {}}
+        }
+        client_plugin.get_packages_installed.return_value = {'pkgs': {'b': {}}}
+        client_plugin.install_package.return_value = Mock(state=OIP_SUCCESS)
+        plugin = client.Plugin(client_plugin, 'foo')
+
+        result = plugin.install_all(concurrency=2)
+
+        self.assertEqual(sorted(result.succeeded), ['a', 'c'])
+        self.assertEqual(
+            sorted(client_plugin.install_package.call_args_list),
+            [call('foo', 'a'), call('foo', 'c')],
+        )
+
+
+class TestSessionCache(unittest.TestCase):
+    def test_disabled_cache_always_fetches(self):
+        cache = client.SessionCache()
+        fetch = Mock(return_value={})
+
+        cache.get(('device', 'd1', 'get'), fetch)
+        cache.get(('device', 'd1', 'get'), fetch)
+
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_hit_returns_a_copy(self):
+        cache = client.SessionCache(ttl=60)
+        fetch = Mock(return_value={'id': 'd1'})
+
+        cache.get(('device', 'd1', 'get'), fetch)['id'] = 'changed'
+        value = cache.get(('device', 'd1', 'get'), fetch)
+
+        self.assertEqual(value, {'id': 'd1'})
+        fetch.assert_called_once_with()
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = client.SessionCache(ttl=60, max_size=2)
+        cache.get(('device', 'd1', 'get'), dict)
+        cache.get(('device', 'd2', 'get'), dict)
+        cache.get(('device', 'd1', 'get'), dict)
+
+        cache.get(('device', 'd3', 'get'), dict)
+
+        fetch = Mock(return_value={})
+        cache.get(('device', 'd1', 'get'), fetch)
+        cache.get(('device', 'd2', 'get'), fetch)
+        fetch.assert_called_once_with()
+
+    def test_update_invalidates_device_and_find_results(self):
+        cache = client.SessionCache(ttl=60)
+        dev_mgr = Mock()
+        dev_mgr.get.return_value = {'id': 'd1'}
+        dev_mgr.list.return_value = {'devices': []}
+        devices = client.Devices(dev_mgr, cache)
+        devices.get('d1')
+        devices.get('d2')
+        devices.find({'plugin': 'foo'})
+
+        devices.update({'id': 'd1'})
+        devices.get('d1')
+        devices.get('d2')
+        devices.find({'plugin': 'foo'})
+
+        self.assertEqual(dev_mgr.get.call_count, 3)
+        self.assertEqual(dev_mgr.list.call_count, 2)
+
+
+class TestDeviceSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.devices = [
+            {'id': 'd1', 'mac': '00:11:22:33:44:01', 'model': 'm1', 'plugin': 'p1'},
+            {'id': 'd2', 'mac': '00:11:22:33:44:02', 'model': 'm1', 'plugin': 'p2'},
+            {'id': 'd3', 'model': 'm2', 'plugin': 'p1', 'vendor': 'v'},
+        ]
+        self.dev_mgr = Mock()
+        self.dev_mgr.list.return_value = {'devices': self.devices}
+        self.snapshot = client.Devices(self.dev_mgr).snapshot()
+
+    def test_using_mac_normalizes_the_mac(self):
+        group = self.snapshot.using_mac('001122334402')
+
+        self.assertEqual(group._device_ids, ['d2'])
+
+    def test_using_plugin(self):
+        group = self.snapshot.using_plugin('p1')
+
+        self.assertEqual(group._device_ids, ['d1', 'd3'])
+        self.dev_mgr.list.assert_called_once_with()
+
+    def test_find(self):
+        self.assertEqual(self.snapshot.find(model='m1', plugin='p1'), [self.devices[0]])
+        self.assertEqual(self.snapshot.find(vendor='v'), [self.devices[2]])
+        self.assertEqual(self.snapshot.find(model='unknown'), [])
+
+
+class TestIterFind(unittest.TestCase):
+    def test_pages_are_fetched_until_a_partial_page(self):
+        device_ids = [f'd{i}' for i in range(5)]
+        dev_mgr = Mock()
+        dev_mgr.list.side_effect = lambda *args, offset, limit, **kwargs: {
+            'devices': [{'id': id_} for id_ in device_ids[offset : offset + limit]]
+        }
+        devices = client.Devices(dev_mgr)
+
+        result = list(devices.iter_find({'plugin': 'foo'}, page_size=2, recurse=True))
+
+        self.assertEqual([device['id'] for device in result], device_ids)
+        self.assertEqual(dev_mgr.list.call_count, 3)
+        dev_mgr.list.assert_called_with(
+            {'plugin': 'foo'},
+            offset=4,
+            limit=2,
+            order='id',
+            direction='ASC',
+            recurse=True,
+        )
+
+
+class TestDevicesUpdateMany(unittest.TestCase):
+    def test_updated_devices_are_synchronized(self):
+        def update(device):
+            if device['id'] == 'd2':
+                raise Exception('invalid device')
+
+        dev_mgr = Mock()
+        dev_mgr.update.side_effect = update
+        dev_mgr.synchronize.side_effect = lambda device_id: Mock(state=OIP_SUCCESS)
+        devices = client.Devices(dev_mgr)
+        on_synchronized = Mock()
+
+        result = devices.update_many(
+            [{'id': 'd1'}, {'id': 'd2'}, {'id': 'd3'}],
+            synchronize=True,
+            concurrency=2,
+            on_synchronized=on_synchronized,
+        )
+
+        self.assertEqual(sorted(result.succeeded), ['d1', 'd3'])
+        self.assertEqual(list(result.failed), ['d2'])
+        self.assertTrue(result.failed['d2'].startswith('update failed'))
+        self.assertEqual(
+            sorted(dev_mgr.synchronize.call_args_list), [call('d1'), call('d3')]
+        )
+        self.assertEqual(on_synchronized.call_count, 2)
+
+
+class TestConfigGroup(unittest.TestCase):
+    def test_set_config_skips_compliant_configs(self):
+        stored_configs = {
+            'c1': {'id': 'c1', 'raw_config': {'ntp': {'ip': '10.0.0.1'}}},
+            'c2': {'id': 'c2', 'raw_config': {}},
+        }
+        cfg_mgr = Mock()
+        cfg_mgr.list.return_value = {'configs': [{'id': 'c1'}, {'id': 'c2'}]}
+        cfg_mgr.get.side_effect = lambda config_id: deepcopy(stored_configs[config_id])
+        group = client.Configs(cfg_mgr).select({'X_type': 'user'})
+
+        result = group.set_config({'ntp.ip': '10.0.0.1'})
+
+        self.assertEqual(result.succeeded, ['c2'])
+        self.assertEqual(result.skipped, ['c1'])
+        cfg_mgr.update.assert_called_once_with(
+            {'id': 'c2', 'raw_config': {'ntp': {'ip': '10.0.0.1'}}}
+        )
+
+    def test_unset_config(self):
+        cfg_mgr = Mock()
+        cfg_mgr.get.side_effect = lambda config_id: {
+            'id': config_id,
+            'raw_config': {'vlan': {'id': 100, 'priority': 3}},
+        }
+        group = client.ConfigGroup(cfg_mgr, ['c1'])
+
+        result = group.unset_config('vlan.id', 'ntp.ip')
+
+        self.assertEqual(result.succeeded, ['c1'])
+        cfg_mgr.update.assert_called_once_with(
+            {'id': 'c1', 'raw_config': {'vlan': {'priority': 3}}}
+        )
+
+
+class TestCopyOnWritePatch(unittest.TestCase):
+    def setUp(self):
+        self.config = {
+            'id': 'c1',
+            'parent_ids': ['base'],
+            'raw_config': {
+                'funckeys': {'1': {'type': 'speeddial', 'value': '1001'}},
+                'sip_lines': {'1': {'username': 'u1'}, '2': {'username': 'u2'}},
+            },
+        }
+        self.original = deepcopy(self.config)
+
+    def test_set_raw_values_copies_only_modified_paths(self):
+        new_config = client._set_raw_values(
+            self.config, {'sip_lines': {'1': {'username': 'new'}}}
+        )
+
+        old_raw_config = self.config['raw_config']
+        new_raw_config = new_config['raw_config']
+        self.assertEqual(new_raw_config['sip_lines']['1'], {'username': 'new'})
+        self.assertEqual(self.config, self.original)
+        self.assertIs(new_config['parent_ids'], self.config['parent_ids'])
+        self.assertIs(new_raw_config['funckeys'], old_raw_config['funckeys'])
+        self.assertIs(
+            new_raw_config['sip_lines']['2'], old_raw_config['sip_lines']['2']
+        )
+
+    def test_set_raw_values_no_change(self):
+        values = {'sip_lines': {'1': {'username': 'u1'}}, 'funckeys': {}}
+
+        self.assertIsNone(client._set_raw_values(self.config, values))
+
+    def test_unset_raw_values_copies_only_modified_paths(self):
+        new_config = client._unset_raw_values(
+            self.config, ['sip_lines.1.username', 'sip_lines.2.username', 'x.y']
+        )
+
+        self.assertEqual(new_config['raw_config']['sip_lines'], {'1': {}, '2': {}})
+        self.assertEqual(self.config, self.original)
+        old_raw_config = self.config['raw_config']
+        self.assertIs(new_config['raw_config']['funckeys'], old_raw_config['funckeys'])
+
+    def test_unset_raw_values_no_change(self):
+        raw_values = ['sip_lines.3.username', 'funckeys.1.type.x', 'x']
+
+        self.assertIsNone(client._unset_raw_values(self.config, raw_values))
+
+    def test_device_set_and_unset(self):
+        dev_mgr = Mock()
+        dev_mgr.get.return_value = {'id': 'd1', 'plugin': 'foo', 'config': 'c1'}
+        device = client.Device('d1', dev_mgr)
+
+        device.set({'plugin': 'foo'}).unset('ip')
+        dev_mgr.update.assert_not_called()
+
+        device.set({'plugin': 'bar'}).unset('config')
+        dev_mgr.update.assert_has_calls(
+            [
+                call({'id': 'd1', 'plugin': 'bar', 'config': 'c1'}),
+                call({'id': 'd1', 'plugin': 'foo'}),
+            ]
+        )
+
+
+class TestEdit(unittest.TestCase):
+    def setUp(self):
+        self.dev_mgr = Mock()
+        self.dev_mgr.get.side_effect = lambda device_id: {
+            'id': device_id,
+            'plugin': 'foo',
+            'ip': '10.0.0.1',
+        }
+        self.device = client.Device('d1', self.dev_mgr)
+
+    def test_modifications_are_sent_in_one_update(self):
+        with self.device.edit() as device:
+            device.set({'plugin': 'bar'}).unset('ip').set({'config': 'c1'})
+
+        self.dev_mgr.get.assert_called_once_with('d1')
+        self.dev_mgr.update.assert_called_once_with(
+            {'id': 'd1', 'plugin': 'bar', 'config': 'c1'}
+        )
+
+    def test_no_update_when_unchanged(self):
+        with self.device.edit() as device:
+            device.set({'plugin': 'foo'}).unset('config')
+
+        self.dev_mgr.update.assert_not_called()
+
+    def test_modifications_are_discarded_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.device.edit() as device:
+                device.set({'plugin': 'bar'})
+                raise RuntimeError()
+
+        self.dev_mgr.get.assert_not_called()
+        self.dev_mgr.update.assert_not_called()
+
+    def test_get_returns_pending_modifications(self):
+        with self.device.edit() as device:
+            device.set({'plugin': 'bar'})
+            self.assertEqual(device.get()['plugin'], 'bar')
+
+        self.dev_mgr.update.assert_called_once_with(
+            {'id': 'd1', 'plugin': 'bar', 'ip': '10.0.0.1'}
+        )
+
+    def test_conflict_when_changed_after_get(self):
+        devices = iter(
+            [
+                {'id': 'd1', 'plugin': 'foo'},
+                {'id': 'd1', 'plugin': 'other'},
+            ]
+        )
+        self.dev_mgr.get.side_effect = lambda device_id: next(devices)
+
+        with self.assertRaises(client.EditConflictError):
+            with self.device.edit() as device:
+                device.get()
+                device.set({'plugin': 'bar'})
+
+        self.dev_mgr.update.assert_not_called()
+
+    def test_config_edit(self):
+        cfg_mgr = Mock()
+        cfg_mgr.get.return_value = {
+            'id': 'c1',
+            'parent_ids': [],
+            'raw_config': {'vlan': {'id': 100}},
+        }
+
+        with client.Config('c1', cfg_mgr).edit() as config:
+            config.set_config({'ntp.ip': '10.0.0.1'})
+            config.unset_config('vlan.id')
+            config.set_parents('base')
+
+        cfg_mgr.update.assert_called_once_with(
+            {
+                'id': 'c1',
+                'parent_ids': ['base'],
+                'raw_config': {'vlan': {}, 'ntp': {'ip': '10.0.0.1'}},
+            }
+        )
+
+
+class TestConfigResolver(unittest.TestCase):
+    def test_first_parent_has_precedence(self):
+        resolver = client.ConfigResolver(
+            [
+                {'id': 'base', 'parent_ids': [], 'raw_config': {'a': 1, 'b': 1}},
+                {'id': 'other', 'parent_ids': [], 'raw_config': {'a': 2, 'c': 2}},
+                {
+                    'id': 'line',
+                    'parent_ids': ['other', 'base'],
+                    'raw_config': {'c': 3, 'd': {'e': 3}},
+                },
+            ]
+        )
+
+        raw_config = resolver.get_raw('line')
+
+        self.assertEqual(raw_config, {'a': 2, 'b': 1, 'c': 3, 'd': {'e': 3}})
+
+    def test_returned_raw_config_is_a_copy(self):
+        resolver = client.ConfigResolver(
+            [{'id': 'base', 'parent_ids': [], 'raw_config': {'a': {'b': 1}}}]
+        )
+
+        resolver.get_raw('base')['a']['b'] = 2
+
+        self.assertEqual(resolver.get_raw('base'), {'a': {'b': 1}})
+
+    def test_cycles_are_reported(self):
+        resolver = client.ConfigResolver(
+            [
+                {'id': 'a', 'parent_ids': ['b'], 'raw_config': {}},
+                {'id': 'b', 'parent_ids': ['a'], 'raw_config': {}},
+                {'id': 'c', 'parent_ids': ['b'], 'raw_config': {}},
+                {'id': 'd', 'parent_ids': [], 'raw_config': {'x': 1}},
+            ]
+        )
+
+        raw_configs = dict(resolver.iter_raw())
+
+        self.assertEqual(raw_configs, {'d': {'x': 1}})
+        self.assertEqual(resolver.cycles, [('a', 'b', 'a')])
+        self.assertRaises(ValueError, resolver.get_raw, 'c')
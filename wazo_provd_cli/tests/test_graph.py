@@ -0,0 +1,85 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+import unittest
+
+from wazo_provd_cli.graph import ConfigGraph, config_levels
+
+
+class TestConfigLevels(unittest.TestCase):
+    def test_levels(self):
+        configs = [
+            {'id': 'line', 'parent_ids': ['device', 'base']},
+            {'id': 'device', 'parent_ids': ['base']},
+            {'id': 'base', 'parent_ids': ['unknown']},
+            {'id': 'other', 'parent_ids': []},
+        ]
+
+        levels, cyclic_ids = config_levels(configs)
+
+        self.assertEqual(levels, [['base', 'other'], ['device'], ['line']])
+        self.assertEqual(cyclic_ids, set())
+
+    def test_cycles(self):
+        configs = [
+            {'id': 'a', 'parent_ids': ['b']},
+            {'id': 'b', 'parent_ids': ['a']},
+            {'id': 'c', 'parent_ids': ['a']},
+            {'id': 'd', 'parent_ids': []},
+        ]
+
+        levels, cyclic_ids = config_levels(configs)
+
+        self.assertEqual(levels, [['d']])
+        self.assertEqual(cyclic_ids, {'a', 'b', 'c'})
+
+
+class TestConfigGraph(unittest.TestCase):
+    def setUp(self):
+        self.configs = [
+            {'id': 'base', 'parent_ids': []},
+            {'id': 'default', 'parent_ids': ['base']},
+            {'id': 'line1', 'parent_ids': ['default', 'base']},
+            {'id': 'line2', 'parent_ids': ['default']},
+            {'id': 'unused', 'parent_ids': ['base']},
+            {'id': 'a', 'parent_ids': ['b']},
+            {'id': 'b', 'parent_ids': ['a', 'unknown']},
+            {'id': 'c', 'parent_ids': ['a']},
+            {'id': 'self', 'parent_ids': ['self']},
+        ]
+        self.devices = [
+            {'id': 'd1', 'config': 'line1'},
+            {'id': 'd2', 'config': 'line1'},
+            {'id': 'd3', 'config': 'c'},
+            {'id': 'd4'},
+        ]
+        self.graph = ConfigGraph(self.configs, self.devices)
+
+    def test_depth(self):
+        self.assertEqual(self.graph.depth('base'), 0)
+        self.assertEqual(self.graph.depth('line1'), 2)
+        self.assertIsNone(self.graph.depth('c'))
+        self.assertEqual(self.graph.max_depth(), 2)
+        self.assertEqual(self.graph.deepest_chain(), ['line1', 'default', 'base'])
+
+    def test_topological_order(self):
+        order = self.graph.topological_order()
+
+        self.assertEqual(order, ['base', 'default', 'unused', 'line1', 'line2'])
+
+    def test_cycles(self):
+        self.assertEqual(self.graph.cycles(), [['a', 'b'], ['self']])
+
+    def test_orphans(self):
+        self.assertEqual(self.graph.orphans(), ['line2', 'self', 'unused'])
+
+    def test_most_children(self):
+        self.assertEqual(self.graph.most_children(2), [('base', 3), ('a', 2)])
+
+    def test_empty(self):
+        graph = ConfigGraph([])
+
+        self.assertEqual(graph.max_depth(), 0)
+        self.assertEqual(graph.deepest_chain(), [])
+        self.assertEqual(graph.cycles(), [])
+        self.assertEqual(graph.orphans(), [])
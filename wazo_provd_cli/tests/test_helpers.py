@@ -1,4 +1,4 @@
-# Copyright 2013-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 #
 # This program is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
@@ -13,7 +13,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>
 
+import tempfile
 import unittest
+from unittest.mock import Mock, patch
+
+from wazo_provd_client.operation import OIP_FAIL, OIP_SUCCESS
 
 from wazo_provd_cli import helpers
 
@@ -32,3 +36,162 @@ class TestHelpers(unittest.TestCase):
         res = helpers._are_plugins_installed(['foo'], installed_plugins)
 
         self.assertTrue(res)
+
+    def test_group_devices_in_waves_by_plugin(self):
+        devices = [
+            {'id': 'd1', 'plugin': 'foo'},
+            {'id': 'd2'},
+            {'id': 'd3', 'plugin': 'foo'},
+        ]
+
+        res = helpers._group_devices_in_waves(devices, 'plugin', 24)
+
+        self.assertEqual(
+            res,
+            [('foo', [devices[0], devices[2]]), ('no plugin', [devices[1]])],
+        )
+
+    def test_group_devices_in_waves_by_subnet(self):
+        devices = [
+            {'id': 'd1', 'ip': '10.0.1.5'},
+            {'id': 'd2', 'ip': '10.0.2.5'},
+            {'id': 'd3', 'ip': '10.0.1.6'},
+        ]
+
+        res = helpers._group_devices_in_waves(devices, 'subnet', 24)
+
+        self.assertEqual(
+            res,
+            [('10.0.1.0/24', [devices[0], devices[2]]), ('10.0.2.0/24', [devices[1]])],
+        )
+
+
+class TestRemoveTransientConfigs(unittest.TestCase):
+    def setUp(self):
+        self.configs = Mock()
+        self.configs.remove_many.return_value = Mock(succeeded=['unused'])
+        self.configs.find.return_value = [
+            {'id': 'used', 'parent_ids': []},
+            {'id': 'unused', 'parent_ids': []},
+        ]
+        self.devices = Mock()
+        self.devices.iter_find.return_value = iter(
+            [{'id': 'd1', 'config': 'used'}, {'id': 'd2'}]
+        )
+        helpers._init_module(self.configs, self.devices, Mock())
+
+    def test_unused_configs_are_removed(self):
+        helpers.remove_transient_configs()
+
+        self.configs.remove_many.assert_called_once_with(
+            [{'id': 'unused', 'parent_ids': []}], None
+        )
+
+    def test_dry_run(self):
+        helpers.remove_transient_configs(dry_run=True)
+
+        self.configs.remove_many.assert_not_called()
+
+
+class TestMassSynchronize(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patcher = patch('wazo_provd_cli.journal.DEFAULT_JOURNAL_DIR', tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.devices = Mock()
+        self.devices.iter_find.side_effect = lambda *args, **kwargs: iter(
+            [{'id': 'd1'}, {'id': 'd2'}]
+        )
+        helpers._init_module(Mock(), self.devices, Mock())
+
+    def test_failed_devices_are_synchronized_again_on_resume(self):
+        def synchronize(device):
+            if device['id'] == 'd1':
+                return OIP_FAIL
+            # interrupt the operation after d1
+            raise KeyboardInterrupt()
+
+        self.devices.synchronize.side_effect = synchronize
+        with self.assertRaises(KeyboardInterrupt):
+            helpers.mass_synchronize(journal=True)
+        self.devices.synchronize.reset_mock()
+        self.devices.synchronize.side_effect = None
+        self.devices.synchronize.return_value = OIP_SUCCESS
+
+        helpers.mass_synchronize(resume=True)
+
+        synchronized_ids = [
+            args[0]['id'] for args, _ in self.devices.synchronize.call_args_list
+        ]
+        self.assertEqual(synchronized_ids, ['d1', 'd2'])
+
+
+class TestPluginReport(unittest.TestCase):
+    def setUp(self):
+        self.devices = Mock()
+        self.devices.iter_find.side_effect = lambda *args, **kwargs: iter(
+            [
+                {'id': 'd1', 'plugin': 'foo'},
+                {'id': 'd2', 'plugin': 'foo'},
+                {'id': 'd3', 'plugin': 'bar'},
+                {'id': 'd4'},
+            ]
+        )
+        self.plugins = Mock()
+        self.plugins.installed.return_value = {'foo': {}, 'baz': {}}
+        helpers._init_module(Mock(), self.devices, self.plugins)
+        helpers._invalidate_plugin_report()
+
+    def test_report(self):
+        report = helpers.plugin_report()
+
+        self.assertEqual(report['device_counts'], {'foo': 2, 'bar': 1})
+        self.assertEqual(report['unused'], ['baz'])
+        self.assertEqual(report['missing'], ['bar'])
+        self.assertEqual(report['devices_without_plugin'], ['d4'])
+
+    def test_helpers(self):
+        self.assertEqual(helpers.used_plugins(), ['bar', 'foo'])
+        self.assertEqual(helpers.installed_plugins(), ['baz', 'foo'])
+        self.assertEqual(helpers.unused_plugins(), ['baz'])
+        self.assertEqual(helpers.missing_plugins(), ['bar'])
+
+    def test_installed_plugins_does_not_list_the_devices(self):
+        self.assertEqual(helpers.installed_plugins(), ['baz', 'foo'])
+
+        self.devices.iter_find.assert_not_called()
+
+    def test_report_is_fresh_by_default(self):
+        helpers.plugin_report()
+        self.plugins.installed.return_value = {'foo': {}}
+
+        self.assertEqual(helpers.unused_plugins(), [])
+        self.assertEqual(self.devices.iter_find.call_count, 2)
+
+    def test_cached_report_is_reused(self):
+        helpers.plugin_report()
+        helpers.used_plugins(cached=True)
+        helpers.missing_plugins(cached=True)
+
+        self.devices.iter_find.assert_called_once()
+        self.plugins.installed.assert_called_once_with()
+
+
+class TestConfigGraph(unittest.TestCase):
+    def test_graph_is_built_from_one_listing_of_each(self):
+        configs = Mock()
+        configs.iter_find.return_value = iter(
+            [{'id': 'base', 'parent_ids': []}, {'id': 'line', 'parent_ids': ['base']}]
+        )
+        devices = Mock()
+        devices.iter_find.return_value = iter([{'id': 'd1', 'config': 'line'}])
+        helpers._init_module(configs, devices, Mock())
+
+        graph = helpers.config_graph()
+
+        configs.iter_find.assert_called_once_with(fields=['id', 'parent_ids'])
+        devices.iter_find.assert_called_once_with(fields=['id', 'config'])
+        self.assertEqual(graph.topological_order(), ['base', 'line'])
+        self.assertEqual(graph.orphans(), [])
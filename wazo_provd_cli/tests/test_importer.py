@@ -0,0 +1,135 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+from wazo_provd_cli.importer import Importer
+
+
+class TestImporter(unittest.TestCase):
+    def setUp(self):
+        self.configs = Mock()
+        self.configs.add.side_effect = lambda config: {'id': config['id']}
+        self.devices = Mock()
+        self.devices.add.side_effect = lambda device: {'id': device['mac']}
+        self.importer = Importer(self.configs, self.devices)
+
+    def _import(self, rows, concurrency=4):
+        result_fobj = io.StringIO()
+        result = self.importer.import_rows(rows, result_fobj, concurrency)
+        row_results = [json.loads(line) for line in result_fobj.getvalue().splitlines()]
+        return result, sorted(row_results, key=lambda row_result: row_result['row'])
+
+    def test_documents_are_expanded_and_normalized(self):
+        rows = [
+            {'type': 'config', 'id': 'site1', 'raw_config.ntp.ip': '10.0.0.1'},
+            {'type': 'device', 'mac': '00-11-22-AA-BB-CC', 'config': 'site1'},
+        ]
+
+        result, row_results = self._import(rows)
+
+        self.assertEqual(sorted(result.succeeded), [1, 2])
+        self.configs.add.assert_called_once_with(
+            {'id': 'site1', 'parent_ids': [], 'raw_config': {'ntp': {'ip': '10.0.0.1'}}}
+        )
+        self.devices.add.assert_called_once_with(
+            {'mac': '00:11:22:aa:bb:cc', 'config': 'site1'}
+        )
+        self.assertEqual(
+            row_results,
+            [
+                {'row': 1, 'type': 'config', 'status': 'ok', 'id': 'site1'},
+                {'row': 2, 'type': 'device', 'status': 'ok', 'id': '00:11:22:aa:bb:cc'},
+            ],
+        )
+
+    def test_devices_wait_for_their_config(self):
+        config_added = threading.Event()
+        device_configs_added = []
+
+        def add_config(config):
+            # give the device rows a chance to run first
+            time.sleep(0.05)
+            config_added.set()
+            return {'id': config['id']}
+
+        def add_device(device):
+            device_configs_added.append(config_added.is_set())
+            return {'id': device['mac']}
+
+        self.configs.add.side_effect = add_config
+        self.devices.add.side_effect = add_device
+        rows = [{'type': 'config', 'id': 'site1'}] + [
+            {'type': 'device', 'mac': f'00:11:22:33:44:{i:02x}', 'config': 'site1'}
+            for i in range(10)
+        ]
+
+        self._import(rows)
+
+        self.assertEqual(device_configs_added, [True] * 10)
+
+    def test_failed_config_fails_its_dependencies(self):
+        self.configs.add.side_effect = [RuntimeError('boom'), {'id': 'other'}]
+        rows = [
+            {'type': 'config', 'id': 'site1'},
+            {'type': 'config', 'id': 'child', 'parent_ids': ['site1']},
+            {'type': 'device', 'mac': '00:11:22:33:44:55', 'config': 'site1'},
+            {'type': 'device', 'mac': '00:11:22:33:44:66', 'config': 'base'},
+        ]
+
+        result, row_results = self._import(rows)
+
+        self.assertEqual(result.succeeded, [4])
+        self.assertEqual(sorted(result.failed), [1, 2, 3])
+        self.assertEqual(self.configs.add.call_count, 1)
+        self.assertEqual(row_results[0]['error'], 'boom')
+
+    def test_invalid_rows_fail_alone(self):
+        rows = [
+            '{"type": "device", "mac": "00:11:22:33:44:55"}',
+            '{invalid',
+            '{"type": "phone"}',
+            '{"type": "device", "mac": "invalid"}',
+        ]
+
+        result, row_results = self._import(rows)
+
+        self.assertEqual(result.succeeded, [1])
+        self.assertEqual(sorted(result.failed), [2, 3, 4])
+        statuses = [row_result['status'] for row_result in row_results]
+        self.assertEqual(statuses, ['ok', 'failed', 'failed', 'failed'])
+
+    def test_import_csv_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'site.csv')
+            with open(path, 'w') as fobj:
+                fobj.write(
+                    'type,id,parent_ids,raw_config.vlan_enabled,mac,config,X_test\n'
+                    'config,site1,"base, defaultconfigdevice",False,,,\n'
+                    'device,,,,001122334455,site1,true\n'
+                )
+
+            result = self.importer.import_file(path)
+
+            with open(f'{path}.result.jsonl') as fobj:
+                nb_row_results = len(fobj.readlines())
+
+        self.assertEqual(sorted(result.succeeded), [1, 2])
+        self.assertEqual(nb_row_results, 2)
+        self.configs.add.assert_called_once_with(
+            {
+                'id': 'site1',
+                'parent_ids': ['base', 'defaultconfigdevice'],
+                'raw_config': {'vlan_enabled': False},
+            }
+        )
+        self.devices.add.assert_called_once_with(
+            {'mac': '00:11:22:33:44:55', 'config': 'site1', 'X_test': True}
+        )
@@ -0,0 +1,86 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from io import StringIO
+
+from wazo_provd_cli.journal import Journal
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.directory = tmp_dir.name
+
+    def test_journal_is_removed_when_completed(self):
+        with Journal('op', directory=self.directory) as journal:
+            journal.record('a')
+
+        self.assertFalse(os.path.exists(journal.path))
+
+    def test_resume_after_interruption(self):
+        try:
+            with Journal('op', directory=self.directory) as journal:
+                journal.record('a')
+                journal.record('b')
+                raise KeyboardInterrupt()
+        except KeyboardInterrupt:
+            pass
+
+        with Journal('op', resume=True, directory=self.directory) as journal:
+            self.assertIn('a', journal)
+            self.assertIn('b', journal)
+            self.assertNotIn('c', journal)
+
+    def test_no_resume_discards_previous_journal(self):
+        try:
+            with Journal('op', directory=self.directory) as journal:
+                journal.record('a')
+                raise KeyboardInterrupt()
+        except KeyboardInterrupt:
+            pass
+
+        with Journal('op', directory=self.directory) as journal:
+            self.assertNotIn('a', journal)
+
+    def test_name_is_made_safe(self):
+        journal = Journal('a/b c', directory=self.directory)
+
+        self.assertEqual(journal.path, os.path.join(self.directory, 'a_b_c'))
+
+    def test_disabled_journal_creates_no_file(self):
+        with Journal('op', directory=self.directory, enabled=False) as journal:
+            journal.record('a')
+            self.assertIn('a', journal)
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_unwritable_directory_continues_without_journal(self):
+        # a directory can't be created under a regular file
+        not_a_directory = os.path.join(self.directory, 'file')
+        open(not_a_directory, 'w').close()
+        stderr = StringIO()
+
+        with redirect_stderr(stderr):
+            with Journal('op', directory=not_a_directory) as journal:
+                journal.record('a')
+                self.assertIn('a', journal)
+
+        self.assertIn('could not open journal', stderr.getvalue())
+
+    def test_journal_in_use_by_another_session(self):
+        stderr = StringIO()
+
+        with Journal('op', directory=self.directory) as journal1:
+            journal1.record('a')
+            with redirect_stderr(stderr):
+                with Journal('op', directory=self.directory) as journal2:
+                    journal2.record('b')
+            with open(journal1.path) as fobj:
+                self.assertEqual(fobj.read(), 'a\n')
+
+        self.assertIn('in use by another session', stderr.getvalue())
@@ -0,0 +1,164 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0+
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from wazo_provd_cli.client import BulkResult
+from wazo_provd_cli.reconcile import Reconciler
+
+
+class TestReconciler(unittest.TestCase):
+    def setUp(self):
+        self.configs = Mock()
+        self.configs.find.return_value = [
+            {
+                'id': 'base',
+                'parent_ids': [],
+                'raw_config': {'ntp_ip': '10.0.0.1'},
+                'deletable': False,
+            },
+            {
+                'id': 'site1',
+                'parent_ids': ['base'],
+                'raw_config': {'ntp_ip': '10.0.0.2'},
+                'X_type': 'site',
+            },
+            {'id': 'old', 'parent_ids': ['base'], 'raw_config': {}},
+            {'id': 'tmp', 'parent_ids': [], 'raw_config': {}, 'transient': True},
+        ]
+        self.devices = Mock()
+        self.devices.find.return_value = [
+            {'id': 'd1', 'mac': '00:11:22:33:44:55', 'config': 'site1', 'ip': 'x'},
+            {'id': 'd2', 'mac': '00:11:22:33:44:66', 'config': 'old'},
+        ]
+        self.devices.update_many.return_value = BulkResult()
+        self.devices.remove_many.return_value = BulkResult()
+        self.configs.remove_many.return_value = BulkResult()
+        self.reconciler = Reconciler(self.configs, self.devices)
+        self.desired_state = {
+            'configs': [
+                {
+                    'id': 'site1',
+                    'parent_ids': ['base'],
+                    'raw_config.ntp_ip': '10.0.0.2',
+                },
+                {'id': 'site2', 'parent_ids': ['site1']},
+            ],
+            'devices': [
+                {'mac': '00-11-22-33-44-55', 'config': 'site1'},
+                {'mac': '00:11:22:33:44:77', 'config': 'site2'},
+            ],
+        }
+
+    def test_unchanged_state_has_an_empty_plan(self):
+        desired_state = {
+            'configs': [
+                {'id': 'base', 'raw_config': {'ntp_ip': '10.0.0.1'}},
+                {
+                    'id': 'site1',
+                    'parent_ids': ['base'],
+                    'raw_config.ntp_ip': '10.0.0.2',
+                },
+                {'id': 'old'},
+            ],
+            'devices': [
+                {'mac': '00:11:22:33:44:55', 'config': 'site1'},
+                {'id': 'd2'},
+            ],
+        }
+
+        plan = self.reconciler.plan(desired_state)
+
+        self.assertTrue(plan.is_empty())
+
+    def test_plan(self):
+        plan = self.reconciler.plan(self.desired_state)
+
+        self.assertEqual(
+            plan.configs_to_create,
+            [{'id': 'site2', 'parent_ids': ['site1'], 'raw_config': {}}],
+        )
+        self.assertEqual(plan.configs_to_update, [])
+        self.assertEqual([c['id'] for c in plan.configs_to_delete], ['old'])
+        self.assertEqual(
+            plan.devices_to_create, [{'mac': '00:11:22:33:44:77', 'config': 'site2'}]
+        )
+        self.assertEqual([d['id'] for d in plan.devices_to_delete], ['d2'])
+
+    def test_update_merges_current_and_desired(self):
+        self.desired_state['configs'][0]['raw_config.ntp_ip'] = '10.0.0.3'
+        self.desired_state['devices'][0]['config'] = 'site2'
+
+        plan = self.reconciler.plan(self.desired_state, prune=False)
+
+        self.assertEqual(
+            plan.configs_to_update,
+            [
+                {
+                    'id': 'site1',
+                    'parent_ids': ['base'],
+                    'raw_config': {'ntp_ip': '10.0.0.3'},
+                    'X_type': 'site',
+                }
+            ],
+        )
+        self.assertEqual(
+            plan.devices_to_update,
+            [{'id': 'd1', 'mac': '00:11:22:33:44:55', 'config': 'site2', 'ip': 'x'}],
+        )
+        self.assertEqual(plan.configs_to_delete, [])
+        self.assertEqual(plan.devices_to_delete, [])
+
+    def test_only_present_sections_are_pruned(self):
+        plan = self.reconciler.plan({'devices': []})
+
+        self.configs.find.assert_not_called()
+        self.assertEqual(plan.configs_to_delete, [])
+        self.assertEqual(len(plan.devices_to_delete), 2)
+
+    def test_config_without_id(self):
+        self.desired_state['configs'].append({'parent_ids': ['base']})
+
+        with self.assertRaisesRegex(ValueError, 'configs entry 2 has no id'):
+            self.reconciler.plan(self.desired_state)
+        self.configs.find.assert_not_called()
+
+    def test_apply_config_without_id(self):
+        plan = self.reconciler.plan(self.desired_state)
+        plan.configs_to_create.append({'parent_ids': ['base']})
+
+        self.assertRaises(ValueError, self.reconciler.apply, plan)
+        self.configs.add.assert_not_called()
+
+    def test_apply_in_dependency_order(self):
+        calls = []
+        self.configs.add.side_effect = lambda config: calls.append(config['id'])
+        self.devices.add.side_effect = lambda device: calls.append(device['mac'])
+        self.desired_state['configs'].append({'id': 'site3', 'parent_ids': ['site2']})
+
+        plan = self.reconciler.plan(self.desired_state)
+        config_result, device_result = self.reconciler.apply(plan, concurrency=4)
+
+        self.assertEqual(calls, ['site2', 'site3', '00:11:22:33:44:77'])
+        self.assertEqual(config_result.succeeded, ['site2', 'site3'])
+        self.devices.remove_many.assert_called_once_with(plan.devices_to_delete, 4)
+        self.configs.remove_many.assert_called_once_with(plan.configs_to_delete, 4)
+
+    def test_reconcile_plan_only(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'fleet.json')
+            with open(path, 'w') as fobj:
+                json.dump(self.desired_state, fobj)
+
+            plan = self.reconciler.reconcile(path, plan_only=True)
+
+        self.assertEqual(len(plan.configs_to_create), 1)
+        self.configs.find.assert_called_once_with()
+        self.devices.find.assert_called_once_with()
+        self.configs.add.assert_not_called()
+        self.devices.add.assert_not_called()
+        self.devices.remove_many.assert_not_called()